@@ -0,0 +1,240 @@
+"""API JSON du colloscope, servie sans l'interface Streamlit.
+
+Usage : python api.py [--hote 0.0.0.0] [--port 8502]
+
+    GET /classes
+    GET /classes/<classe>/groups
+    GET /classes/<classe>/groups/<groupe>/weeks/<semaine>
+    GET /classes/<classe>/calendar.ics
+    GET /classes/<classe>/groups/<groupe>/calendar.ics
+
+HEAD est accepté sur les mêmes routes. Toutes les routes acceptent ?annee=2024-2025 (année scolaire en cours ou suivante)
+et renvoient un ETag dérivé de la version des classeurs (et des dates des semaines
+pour les routes datées), pour les caches clients et proxys.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import traceback
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import streamlit_app as app
+
+CACHE_CONTROL = "public, max-age=60"
+
+
+def annees_servies():
+    actuelle = app.detecter_annee_scolaire_actuelle()
+    return [actuelle, app.annee_scolaire_suivante(actuelle)]
+
+
+def lister_classes(annee):
+    return {"annee": annee, "classes": app.decouvrir_classes()}
+
+
+def lister_groupes(annee, classe):
+    index = app.obtenir_index(classe, annee)
+    return {
+        "annee": annee,
+        "classe": classe,
+        "groupes": [{"groupe": groupe, "semaines": nb} for groupe, nb in index.nb_semaines.items()],
+    }
+
+
+def colles_semaine(annee, classe, groupe, semaine):
+    index = app.obtenir_index(classe, annee)
+    if groupe not in index.nb_semaines:
+        raise LookupError(f"Le groupe '{groupe}' n'existe pas dans les données.")
+    numero = int(semaine)
+    if not 1 <= numero <= index.nb_semaines[groupe]:
+        raise LookupError(f"La semaine {numero} n'est pas valide pour le groupe '{groupe}'.")
+
+    # Même datation que l'application ; null si le colloscope n'est pas daté
+    lundi = app.obtenir_index_semaines(classe, annee).lundi_semaine(numero)
+    return {
+        "annee": annee,
+        "classe": classe,
+        "groupe": groupe,
+        "semaine": numero,
+        "date": lundi.isoformat() if lundi else None,
+        "colles": [
+            dict(zip(("professeur", "jour", "heure", "salle", "matiere"), ligne))
+            for ligne in index.lignes.get((groupe, numero), [])
+        ],
+        "cles_inconnues": index.cles_inconnues.get((groupe, numero), []),
+    }
+
+
+def calendrier_classe(annee, classe):
+    return app.generer_ics(classe, annee)
+
+
+def calendrier_groupe(annee, classe, groupe):
+    if groupe not in app.obtenir_index(classe, annee).nb_semaines:
+        raise LookupError(f"Le groupe '{groupe}' n'existe pas dans les données.")
+    return app.generer_ics(classe, annee, groupe)
+
+
+ROUTES = [
+    (re.compile(r"^/classes/?$"), lister_classes),
+    (re.compile(r"^/classes/(?P<classe>[^/]+)/groups/?$"), lister_groupes),
+    (re.compile(r"^/classes/(?P<classe>[^/]+)/groups/(?P<groupe>[^/]+)/weeks/(?P<semaine>\d+)/?$"), colles_semaine),
+    (re.compile(r"^/classes/(?P<classe>[^/]+)/calendar\.ics$"), calendrier_classe),
+    (re.compile(r"^/classes/(?P<classe>[^/]+)/groups/(?P<groupe>[^/]+)/calendar\.ics$"), calendrier_groupe),
+]
+
+# Routes qui datent les semaines par l'index des semaines : leurs dates dépendent
+# aussi des vacances (semaines déduites), pas seulement des classeurs
+ROUTES_DATEES = {colles_semaine, calendrier_classe, calendrier_groupe}
+
+
+def derniere_modification(classes):
+    # Feuilles Google Sheets : pas de date de fichier, seul l'ETag valide les copies
+    if any(app.feuille_classe(classe) is not None for classe in classes):
+        return None
+    mtimes = [
+        os.stat(app.chemin_ressource(nom)).st_mtime
+        for classe in classes
+        for nom in app.fichiers_classe(classe)
+        if os.path.exists(app.chemin_ressource(nom))
+    ]
+    return int(max(mtimes, default=0))
+
+
+class GestionnaireAPI(BaseHTTPRequestHandler):
+    server_version = "ColloscopeAPI/1.0"
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    journaliser = True
+    envoyer_corps = True
+
+    def do_GET(self):
+        self.envoyer_corps = True
+        self.executer()
+
+    def do_HEAD(self):
+        # Mêmes en-têtes que GET (ETag, Content-Length), sans le corps
+        self.envoyer_corps = False
+        self.executer()
+
+    def executer(self):
+        try:
+            self.traiter_requete()
+        except Exception:
+            # Réponse JSON plutôt qu'une connexion coupée sans réponse
+            self.log_error("Erreur sur %s\n%s", self.path, traceback.format_exc())
+            self.repondre(500, {"erreur": "Erreur interne du serveur."})
+
+    def traiter_requete(self):
+        url = urlsplit(self.path)
+        annee = parse_qs(url.query).get("annee", [app.detecter_annee_scolaire_actuelle()])[0]
+        # L'année entre dans les chemins du cache : seules les années servies sont acceptées
+        if annee not in annees_servies():
+            return self.repondre(400, {"erreur": f"Année scolaire invalide : '{annee}' (attendu : {' ou '.join(annees_servies())})."})
+
+        for motif, route in ROUTES:
+            match = motif.match(url.path)
+            if match:
+                break
+        else:
+            return self.repondre(404, {"erreur": "Ressource inconnue."})
+
+        parametres = {cle: unquote(valeur) for cle, valeur in match.groupdict().items()}
+        classes = app.decouvrir_classes()
+        if "classe" in parametres:
+            if parametres["classe"] not in classes:
+                return self.repondre(404, {"erreur": f"La classe '{parametres['classe']}' n'existe pas."})
+            classes = [parametres["classe"]]
+
+        # La réponse dépend des classeurs et de l'année : la version des fichiers
+        # valide les copies en cache, avec les dates des semaines quand la route en sert.
+        if route is lister_classes:
+            # Le listing ne lit aucune donnée : un stat par classe suffit, sans charger
+            # les classes ni les faire entrer dans les versions servies
+            elements = [annee] + [f"{classe}:{app.version_classe(classe)}" for classe in classes]
+        else:
+            elements = [annee] + [app.version_servie(classe, annee) for classe in classes]
+        if route in ROUTES_DATEES:
+            elements += [repr(app.obtenir_index_semaines(classe, annee).lundis_semaines) for classe in classes]
+            # Pas de date de fichier qui couvre aussi les vacances : seul l'ETag valide
+            modification = None
+        else:
+            modification = derniere_modification(classes)
+        version = "|".join(elements)
+        etag = '"' + hashlib.sha1(version.encode()).hexdigest()[:20] + '"'
+        entetes = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if modification is not None:
+            entetes["Last-Modified"] = formatdate(modification, usegmt=True)
+        if self.non_modifie(etag, modification):
+            return self.repondre(304, None, entetes)
+
+        try:
+            corps = route(annee, **parametres)
+        except LookupError as e:
+            return self.repondre(404, {"erreur": str(e)})
+        except ValueError as e:
+            return self.repondre(400, {"erreur": str(e)})
+        self.repondre(200, corps, entetes)
+
+    def non_modifie(self, etag, modification):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in [valeur.strip() for valeur in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since and modification is not None:
+            try:
+                return modification <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def repondre(self, statut, corps, entetes=None):
+        # Les routes renvoient un dict (JSON) ou un calendrier iCalendar déjà sérialisé
+        if corps is None:
+            contenu, type_contenu = b"", None
+        elif isinstance(corps, str):
+            contenu, type_contenu = corps.encode("utf-8"), "text/calendar; charset=utf-8"
+        else:
+            contenu, type_contenu = json.dumps(corps, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        self.send_response(statut)
+        for nom, valeur in (entetes or {}).items():
+            self.send_header(nom, valeur)
+        if type_contenu is not None:
+            self.send_header("Content-Type", type_contenu)
+        if statut != 304:
+            self.send_header("Content-Length", str(len(contenu)))
+        self.end_headers()
+        if self.envoyer_corps:
+            self.wfile.write(contenu)
+
+    def log_message(self, format, *args):
+        if self.journaliser:
+            super().log_message(format, *args)
+
+
+def creer_serveur(hote, port):
+    return ThreadingHTTPServer((hote, port), GestionnaireAPI)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hote", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+
+    serveur = creer_serveur(args.hote, args.port)
+    print(f"API du colloscope sur http://{args.hote}:{args.port}/classes")
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        serveur.server_close()
+
+
+if __name__ == "__main__":
+    main()
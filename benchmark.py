@@ -0,0 +1,525 @@
+"""Mesures de performance du colloscope.
+
+Usage :
+    python benchmark.py chargement [--classe 1] [--repetitions 20]
+    python benchmark.py classeurs [--groupes 20 100 500] [--repetitions 5]
+    python benchmark.py magasin [--classe 1] [--repetitions 200]
+    python benchmark.py api [--classe 1] [--requetes 2000] [--fils 8]
+    python benchmark.py suite [--rapport rapport.json] [--reference ancien.json] [--tolerance 0.25]
+    python benchmark.py demarrage [--processus 5] [--sans-prechauffage] [--sans-instantanes]
+    python benchmark.py sheets [--classe 1] [--repetitions 20]
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+import streamlit as st
+from openpyxl import Workbook, load_workbook
+
+import streamlit_app as app
+
+
+def chronometrer(fonction, repetitions):
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append((time.perf_counter() - debut) * 1000)
+    return durees
+
+
+def afficher(nom, durees):
+    print(f"{nom:<28} min {min(durees):8.2f} ms   médiane {statistics.median(durees):8.2f} ms   max {max(durees):8.2f} ms")
+
+
+def bench_chargement(args):
+    fichier_colloscope, fichier_legende = app.fichiers_classe(args.classe)
+    annee_numerique = int(args.annee.split('-')[0])
+
+    print(f"== Chargement à froid, classe {args.classe} ({args.repetitions} répétitions)")
+    afficher("xlsx (openpyxl)", chronometrer(
+        lambda: app.lire_classeurs(app.chemin_ressource(fichier_colloscope), app.chemin_ressource(fichier_legende), annee_numerique),
+        args.repetitions,
+    ))
+    app.compiler_instantane(args.classe, args.annee)
+    afficher("instantané (projection)", chronometrer(lambda: app.charger_instantane(args.classe, args.annee), args.repetitions))
+    # Les valeurs ne sont décodées qu'à la lecture : coût d'un parcours complet
+    afficher("instantané (tout lu)", chronometrer(
+        lambda: app.figer_donnees(*app.charger_instantane(args.classe, args.annee)), args.repetitions
+    ))
+
+
+def generer_classeurs(dossier, nb_groupes, annee_numerique, nb_semaines=30, cles_par_matiere=15):
+    # Classeurs au format du README, avec des colles tirées au hasard
+    aleatoire = random.Random(nb_groupes)
+    cles = [f"{prefixe}{numero}" for prefixe in app.MATIERES_MAP for numero in range(1, cles_par_matiere + 1)]
+    premier_lundi = datetime(annee_numerique, 9, 16)
+
+    colloscope = Workbook(write_only=True)
+    feuille = colloscope.create_sheet()
+    feuille.append([None] + [
+        f"S{s} ({(premier_lundi + timedelta(weeks=s - 1)).strftime('%d/%m')})" for s in range(1, nb_semaines + 1)
+    ])
+    for groupe in range(1, nb_groupes + 1):
+        feuille.append([f"G{groupe}"] + [" ".join(aleatoire.sample(cles, 3)) for _ in range(nb_semaines)])
+    fichier_colloscope = os.path.join(dossier, f"Colloscope_{nb_groupes}.xlsx")
+    colloscope.save(fichier_colloscope)
+
+    legende = Workbook(write_only=True)
+    feuille = legende.create_sheet()
+    feuille.append(["Clé", "Professeur", "Jour", "Heure", "Salle"])
+    for cle in cles:
+        feuille.append([cle, f"M.{cle}", aleatoire.choice(["lundi", "mardi", "mercredi", "jeudi", "vendredi"]),
+                        f"{aleatoire.randint(8, 18)}h35", f"A{aleatoire.randint(100, 300)}"])
+    fichier_legende = os.path.join(dossier, f"Legende_{nb_groupes}.xlsx")
+    legende.save(fichier_legende)
+    return fichier_colloscope, fichier_legende
+
+
+def lire_classeurs_mode_complet(fichier_colloscope, fichier_legende, annee_numerique):
+    # Référence : chargement openpyxl complet, tel qu'utilisé avant la lecture en flux
+    lignes = []
+    for fichier in (fichier_colloscope, fichier_legende):
+        classeur = load_workbook(fichier, data_only=True)
+        lignes.append(list(classeur.active.iter_rows(values_only=True)))
+    return app.interpreter_lignes(lignes[0], lignes[1], annee_numerique)
+
+
+def pic_memoire(fonction):
+    tracemalloc.start()
+    try:
+        fonction()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def bench_classeurs(args):
+    annee_numerique = int(args.annee.split('-')[0])
+    with tempfile.TemporaryDirectory() as dossier:
+        for nb_groupes in args.groupes:
+            fichiers = generer_classeurs(dossier, nb_groupes, annee_numerique)
+            print(f"== {nb_groupes} groupes ({args.repetitions} répétitions)")
+            for nom, lecteur in (("mode complet", lire_classeurs_mode_complet), ("lecture en flux", app.lire_classeurs)):
+                afficher(nom, chronometrer(lambda: lecteur(*fichiers, annee_numerique), args.repetitions))
+                print(f"{'':<28} pic mémoire {pic_memoire(lambda: lecteur(*fichiers, annee_numerique)):8.2f} Mo")
+
+
+def bench_magasin(args):
+    # main() lit les données de la classe trois fois par réexécution
+    version = app.version_classe(args.classe)
+
+    @st.cache_data
+    def charger_par_copie(classe, annee, version):
+        # Référence : ancien st.cache_data, qui désérialise une copie à chaque appel
+        donnees = app.charger_instantane(classe, annee) or app.compiler_instantane(classe, annee)
+        return dict(donnees.dictionnaire_donnees), dict(donnees.dictionnaire_legende), list(donnees.dates_semaines)
+
+    def reexecution(chargeur):
+        return lambda: [chargeur(args.classe, args.annee) for _ in range(3)]
+
+    charger_par_copie(args.classe, args.annee, version)
+    app.charger_donnees(args.classe, args.annee)
+    print(f"== Lectures des données sur une réexécution (3 appels, {args.repetitions} répétitions)")
+    afficher("st.cache_data (copie)", chronometrer(
+        reexecution(lambda classe, annee: charger_par_copie(classe, annee, app.version_classe(classe))), args.repetitions
+    ))
+    afficher("magasin partagé", chronometrer(reexecution(app.charger_donnees), args.repetitions))
+
+
+def debit_http(url, requetes, fils, entetes=None):
+    par_fil = requetes // fils
+
+    def client(_):
+        with requests.Session() as session:
+            for _ in range(par_fil):
+                session.get(url, headers=entetes).raise_for_status()
+
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=fils) as executeur:
+        list(executeur.map(client, range(fils)))
+    return par_fil * fils / (time.perf_counter() - debut)
+
+
+def bench_api(args):
+    import api
+    from streamlit.testing.v1 import AppTest
+
+    api.GestionnaireAPI.journaliser = False
+    serveur = api.creer_serveur("127.0.0.1", 0)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{serveur.server_port}/classes/{args.classe}/groups/G1/weeks/1?annee={args.annee}"
+
+    try:
+        etag = requests.get(url).headers["ETag"]
+        print(f"== Débit, {args.requetes} requêtes sur {args.fils} fils")
+        print(f"{'API (200)':<28} {debit_http(url, args.requetes, args.fils):10.0f} req/s")
+        print(f"{'API (304, If-None-Match)':<28} {debit_http(url, args.requetes, args.fils, {'If-None-Match': etag}):10.0f} req/s")
+    finally:
+        serveur.shutdown()
+
+    # Référence : un clic sur « Afficher » = une réexécution complète du script
+    page = AppTest.from_file(app.chemin_ressource("streamlit_app.py"), default_timeout=60)
+    page.session_state["classe"] = args.classe
+    page.run()
+    reexecutions = max(1, args.requetes // 50)
+    debut = time.perf_counter()
+    for _ in range(reexecutions):
+        page.button(key="afficher_btn").click().run()
+    print(f"{'Page Streamlit':<28} {reexecutions / (time.perf_counter() - debut):10.0f} réexécutions/s")
+
+
+class VacancesFactices(BaseHTTPRequestHandler):
+    # Remplace l'API de l'Éducation nationale : réponse fixe, sans réseau
+    def do_GET(self):
+        annee = int(app.detecter_annee_scolaire_actuelle().split('-')[0])
+        corps = json.dumps({"records": [
+            {"fields": {"start_date": f"{annee}-10-18T22:00:00+00:00", "end_date": f"{annee}-11-03T23:00:00+00:00"}},
+            {"fields": {"start_date": f"{annee}-12-20T23:00:00+00:00", "end_date": f"{annee + 1}-01-05T23:00:00+00:00"}},
+        ]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Zone fictive : les calendriers du stub ne se mêlent pas à ceux de l'application
+ENVIRONNEMENT_VACANCES = {"COLLOSCOPE_ZONE_VACANCES": "Benchmark", "COLLOSCOPE_ZONES_VACANCES": "Benchmark"}
+
+
+def supprimer_vacances_factices():
+    dossier = app.chemin_ressource(app.CONFIG["dossier_cache"])
+    for fichier in glob.glob(os.path.join(dossier, "vacances_Benchmark_*.json")):
+        os.remove(fichier)
+
+
+def statistiques(durees):
+    durees = sorted(durees)
+    return {
+        "min_ms": round(durees[0], 3),
+        "mediane_ms": round(statistics.median(durees), 3),
+        "p95_ms": round(durees[min(len(durees) - 1, int(len(durees) * 0.95))], 3),
+        "max_ms": round(durees[-1], 3),
+        "repetitions": len(durees),
+    }
+
+
+def vider_caches():
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+def bench_suite(args):
+    from streamlit.testing.v1 import AppTest
+
+    # La page est réexécutée par AppTest dans ce processus : CONFIG relit l'environnement
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), VacancesFactices)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    os.environ["COLLOSCOPE_VACANCES_URL"] = f"http://127.0.0.1:{stub.server_port}/"
+    os.environ.update(ENVIRONNEMENT_VACANCES)
+
+    def nouvelle_page():
+        page = AppTest.from_file(app.chemin_ressource("streamlit_app.py"), default_timeout=60)
+        page.query_params["classe"] = args.classe
+        return page
+
+    def verifier(page):
+        if page.exception:
+            raise RuntimeError(page.exception[0].value)
+        return page
+
+    mesures = {}
+    try:
+        # Démarrage à froid : caches du processus vidés, vacances à récupérer
+        durees = []
+        for _ in range(args.demarrages):
+            vider_caches()
+            supprimer_vacances_factices()
+            page = nouvelle_page()
+            debut = time.perf_counter()
+            verifier(page.run())
+            durees.append((time.perf_counter() - debut) * 1000)
+        mesures["demarrage_froid"] = statistiques(durees)
+
+        # Réexécutions à chaud déclenchées par les boutons de la barre latérale
+        page = verifier(nouvelle_page().run())
+        for nom, cle in (("afficher", "afficher_btn"), ("semaine_suivante", "next_semaine_btn"),
+                         ("semaine_precedente", "prev_semaine_btn")):
+            mesures[nom] = statistiques(chronometrer(
+                lambda: verifier(page.button(key=cle).click().run()), args.repetitions
+            ))
+    finally:
+        stub.shutdown()
+        stub.server_close()
+        supprimer_vacances_factices()
+
+    # Débit du chargeur sur des classeurs synthétiques de taille croissante
+    annee_numerique = int(args.annee.split('-')[0])
+    with tempfile.TemporaryDirectory() as dossier:
+        for nb_groupes in args.groupes:
+            fichiers = generer_classeurs(dossier, nb_groupes, annee_numerique)
+            resultat = statistiques(chronometrer(lambda: app.lire_classeurs(*fichiers, annee_numerique), args.repetitions_classeurs))
+            resultat["groupes_par_s"] = round(nb_groupes / (resultat["mediane_ms"] / 1000), 1)
+            mesures[f"classeurs_{nb_groupes}_groupes"] = resultat
+
+    for nom, resultat in mesures.items():
+        print(f"{nom:<28} médiane {resultat['mediane_ms']:9.2f} ms   p95 {resultat['p95_ms']:9.2f} ms")
+
+    rapport = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "streamlit": st.__version__,
+        "classe": args.classe,
+        "annee": args.annee,
+        "mesures": mesures,
+    }
+    if args.rapport:
+        with open(args.rapport, 'w') as f:
+            json.dump(rapport, f, ensure_ascii=False, indent=2)
+        print(f"Rapport écrit dans {args.rapport}")
+
+    if args.reference:
+        with open(args.reference, 'r') as f:
+            reference = json.load(f)["mesures"]
+        regressions = [
+            f"{nom} : {reference[nom]['mediane_ms']:.2f} ms -> {resultat['mediane_ms']:.2f} ms"
+            for nom, resultat in mesures.items()
+            if nom in reference and resultat["mediane_ms"] > reference[nom]["mediane_ms"] * (1 + args.tolerance)
+        ]
+        for regression in regressions:
+            print(f"RÉGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+# Exécuté dans un interpréteur neuf : seul streamlit est importé avant le premier rendu,
+# comme dans un worker qui vient de démarrer.
+SCRIPT_DEMARRAGE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+chemin, classe, autre = sys.argv[1:4]
+page = AppTest.from_file(chemin, default_timeout=120)
+page.query_params["classe"] = classe
+debut = time.perf_counter()
+page.run()
+premier_rendu = (time.perf_counter() - debut) * 1000
+modules = [nom for nom in ("pandas", "openpyxl", "requests") if nom in sys.modules]
+time.sleep(float(sys.argv[4]))
+debut = time.perf_counter()
+page.selectbox(key="classe_select").set_value(autre).run()
+changement = (time.perf_counter() - debut) * 1000
+erreurs = [str(e.value) for e in page.exception]
+print(json.dumps({"premier_rendu": premier_rendu, "changement_classe": changement, "modules": modules, "erreurs": erreurs}))
+"""
+
+
+def bench_demarrage(args):
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), VacancesFactices)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    environnement = dict(
+        os.environ,
+        COLLOSCOPE_VACANCES_URL=f"http://127.0.0.1:{stub.server_port}/",
+        **ENVIRONNEMENT_VACANCES,
+        COLLOSCOPE_PRECHAUFFAGE="0" if args.sans_prechauffage else "1",
+    )
+    classes = app.decouvrir_classes()
+    autre = next((classe for classe in classes if classe != args.classe), args.classe)
+
+    resultats = []
+    try:
+        for _ in range(args.processus):
+            if args.sans_instantanes:
+                # Worker tout juste déployé : les classeurs doivent être relus
+                for classe in classes:
+                    if os.path.exists(app.chemin_instantane(classe, args.annee)):
+                        os.remove(app.chemin_instantane(classe, args.annee))
+            sortie = subprocess.run(
+                [sys.executable, "-c", SCRIPT_DEMARRAGE, app.chemin_ressource("streamlit_app.py"),
+                 args.classe, autre, str(args.pause)],
+                env=environnement, capture_output=True, text=True, check=True,
+            )
+            resultat = json.loads(sortie.stdout.strip().splitlines()[-1])
+            if resultat["erreurs"]:
+                raise RuntimeError(resultat["erreurs"][0])
+            resultats.append(resultat)
+    finally:
+        stub.shutdown()
+        stub.server_close()
+        supprimer_vacances_factices()
+
+    print(f"== Worker neuf, classe {args.classe} puis {autre} ({args.processus} processus, "
+          f"préchauffage {'désactivé' if args.sans_prechauffage else 'activé'}"
+          f"{', sans instantanés' if args.sans_instantanes else ''})")
+    afficher("premier rendu", [r["premier_rendu"] for r in resultats])
+    afficher(f"passage à la classe {autre}", [r["changement_classe"] for r in resultats])
+    print(f"{'modules au premier rendu':<28} {', '.join(resultats[0]['modules']) or 'aucun'}")
+
+
+class FeuillesFactices(BaseHTTPRequestHandler):
+    # Imite Drive (files.get?fields=version) et Sheets (values.batchGet) à partir
+    # des classeurs locaux ; compte les requêtes reçues par point d'accès
+    onglets = {}
+    revision = 1
+    requetes = {"revision": 0, "batchGet": 0}
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.startswith("/drive/v3/files/"):
+            self.requetes["revision"] += 1
+            corps = {"version": str(self.revision)}
+        elif url.path.endswith("/values:batchGet"):
+            self.requetes["batchGet"] += 1
+            corps = {"valueRanges": [
+                {"range": plage, "majorDimension": "ROWS", "values": self.onglets[plage]}
+                for plage in parse_qs(url.query)["ranges"]
+            ]}
+        else:
+            self.send_error(404)
+            return
+        contenu = json.dumps(corps).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(contenu)))
+        self.end_headers()
+        self.wfile.write(contenu)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def valeurs_feuille(chemin):
+    # Comme l'API (FORMATTED_VALUE) : chaînes, cellules vides en fin de ligne omises
+    valeurs = []
+    for ligne in app.lire_lignes(chemin):
+        cellules = ["" if cellule is None else str(cellule) for cellule in ligne]
+        while cellules and cellules[-1] == "":
+            cellules.pop()
+        valeurs.append(cellules)
+    return valeurs
+
+
+def bench_sheets(args):
+    fichier_colloscope, fichier_legende = (app.chemin_ressource(nom) for nom in app.fichiers_classe(args.classe))
+    FeuillesFactices.onglets = dict(zip(app.CONFIG["sheets_plages"], (
+        valeurs_feuille(fichier_colloscope), valeurs_feuille(fichier_legende)
+    )))
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), FeuillesFactices)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    classe = "sheets-benchmark"
+    app.CONFIG.update(
+        sheets_classes={classe: "feuille-factice"},
+        sheets_api_url=f"http://127.0.0.1:{stub.server_port}",
+        drive_api_url=f"http://127.0.0.1:{stub.server_port}",
+        sheets_compte_service="",
+        # Révision revérifiée (en arrière-plan) à chaque appel : le pire cas de la vérification conditionnelle
+        sheets_fraicheur_s=0,
+    )
+    annee_numerique = int(args.annee.split('-')[0])
+    attendu = app.lire_classeurs(fichier_colloscope, fichier_legende, annee_numerique)
+
+    try:
+        donnees = app.compiler_instantane(classe, args.annee)
+        if donnees != app.figer_donnees(*attendu):
+            raise RuntimeError("La feuille factice ne redonne pas les données des classeurs.")
+
+        print(f"== Classe {args.classe} servie par une feuille factice ({args.repetitions} répétitions)")
+        afficher("xlsx (openpyxl)", chronometrer(
+            lambda: app.lire_classeurs(fichier_colloscope, fichier_legende, annee_numerique), args.repetitions
+        ))
+        FeuillesFactices.requetes.update(revision=0, batchGet=0)
+        afficher("batchGet + analyse", chronometrer(lambda: app.lire_sources(classe, args.annee), args.repetitions))
+        print(f"{'':<28} requêtes {FeuillesFactices.requetes}")
+        FeuillesFactices.requetes.update(revision=0, batchGet=0)
+        afficher("révision inchangée", chronometrer(lambda: app.charger_instantane(classe, args.annee), args.repetitions))
+        print(f"{'':<28} requêtes {FeuillesFactices.requetes}")
+
+        FeuillesFactices.revision += 1
+        app.client_sheets().actualiser("feuille-factice")
+        if app.charger_instantane(classe, args.annee) is not None:
+            raise RuntimeError("L'instantané survit à une nouvelle révision.")
+        print(f"{'nouvelle révision':<28} instantané invalidé")
+
+        # Drive injoignable : la page lit la dernière révision connue sans attendre
+        stub.shutdown()
+        stub.server_close()
+        afficher("Drive injoignable", chronometrer(lambda: app.version_classe(classe), args.repetitions))
+    finally:
+        stub.shutdown()
+        stub.server_close()
+        # Instantané et verrou de la classe factice : rien ne doit rester dans le cache
+        chemin = app.chemin_instantane(classe, args.annee)
+        for fichier in (chemin, f"{chemin}.lock"):
+            if os.path.exists(fichier):
+                os.remove(fichier)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--classe", default="1")
+    parser.add_argument("--annee", default=app.detecter_annee_scolaire_actuelle())
+    sous_commandes = parser.add_subparsers(dest="commande", required=True)
+
+    chargement = sous_commandes.add_parser("chargement", help="xlsx contre instantané")
+    chargement.add_argument("--repetitions", type=int, default=20)
+    chargement.set_defaults(fonction=bench_chargement)
+
+    classeurs = sous_commandes.add_parser("classeurs", help="mode complet contre lecture en flux, classeurs synthétiques")
+    classeurs.add_argument("--groupes", type=int, nargs="+", default=[20, 100, 500])
+    classeurs.add_argument("--repetitions", type=int, default=5)
+    classeurs.set_defaults(fonction=bench_classeurs)
+
+    magasin = sous_commandes.add_parser("magasin", help="coût par réexécution : copie st.cache_data contre magasin partagé")
+    magasin.add_argument("--repetitions", type=int, default=200)
+    magasin.set_defaults(fonction=bench_magasin)
+
+    charge = sous_commandes.add_parser("api", help="débit de l'API JSON contre la page Streamlit")
+    charge.add_argument("--requetes", type=int, default=2000)
+    charge.add_argument("--fils", type=int, default=8)
+    charge.set_defaults(fonction=bench_api)
+
+    suite = sous_commandes.add_parser("suite", help="page complète via AppTest et chargeur, rapport JSON")
+    suite.add_argument("--demarrages", type=int, default=3)
+    suite.add_argument("--repetitions", type=int, default=20)
+    suite.add_argument("--groupes", type=int, nargs="+", default=[20, 100, 500])
+    suite.add_argument("--repetitions-classeurs", type=int, default=3)
+    suite.add_argument("--rapport", help="fichier JSON où écrire les mesures")
+    suite.add_argument("--reference", help="rapport précédent : code de sortie 1 si une médiane régresse")
+    suite.add_argument("--tolerance", type=float, default=0.25, help="marge tolérée par rapport à la référence")
+    suite.set_defaults(fonction=bench_suite)
+
+    demarrage = sous_commandes.add_parser("demarrage", help="temps jusqu'au premier rendu d'un worker neuf")
+    demarrage.add_argument("--processus", type=int, default=5)
+    demarrage.add_argument("--pause", type=float, default=1.0, help="secondes entre le premier rendu et le changement de classe")
+    demarrage.add_argument("--sans-prechauffage", action="store_true")
+    demarrage.add_argument("--sans-instantanes", action="store_true", help="supprime les instantanés avant chaque processus")
+    demarrage.set_defaults(fonction=bench_demarrage)
+
+    sheets = sous_commandes.add_parser("sheets", help="source Google Sheets contre serveur factice")
+    sheets.add_argument("--repetitions", type=int, default=20)
+    sheets.set_defaults(fonction=bench_sheets)
+
+    args = parser.parse_args()
+    args.fonction(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Précompile les instantanés des classeurs (à lancer après chaque dépôt de fichiers).
+
+Usage : python compiler_instantanes.py [classe ...] [--annee 2024-2025]
+"""
+import argparse
+import time
+
+import streamlit_app as app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("classes", nargs="*", help="classes à compiler (défaut : toutes)")
+    parser.add_argument("--annee", default=app.detecter_annee_scolaire_actuelle())
+    args = parser.parse_args()
+
+    for classe in args.classes or app.decouvrir_classes():
+        debut = time.perf_counter()
+        donnees, _, _ = app.compiler_instantane(classe, args.annee)
+        duree = (time.perf_counter() - debut) * 1000
+        print(f"Classe {classe} : {len(donnees)} groupes -> {app.chemin_instantane(classe, args.annee)} ({duree:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
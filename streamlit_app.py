@@ -1,14 +1,36 @@
 import os
 import streamlit as st
-import requests
-from openpyxl import load_workbook
 import pandas as pd
-from datetime import datetime, timedelta
+from PIL import Image
+from datetime import date, datetime, timedelta, timezone
 import base64
+import hashlib
+import io
+import mmap
+import struct
 import re
 import json
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, Iterator, List, Mapping, NamedTuple, Tuple, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows : pas de verrou entre processus, chaque worker compile de son côté
+    fcntl = None
+
+# openpyxl et requests ne sont importés que sur les chemins qui s'en servent
+# (instantané manquant, rafraîchissement des vacances) : un worker neuf ne les charge pas.
+if TYPE_CHECKING:
+    import requests
 
 # ============================================================================
 # CONFIGURATION & SETUP
@@ -22,12 +44,51 @@ st.set_page_config(
 )
 
 CONFIG = {
-    "max_groups": 20,
-    "max_weeks": 30,
-    "max_classes": 2,
+    # Nombre de classes gardées en mémoire (les moins récemment consultées sont évincées)
+    "classes_en_memoire": 4,
+    "calendriers_en_memoire": 64,
     "school_year_start_month": 9,
+    "dossier_cache": ".colloscope_cache",
+    "vacances_api_url": os.getenv(
+        "COLLOSCOPE_VACANCES_URL", "https://data.education.gouv.fr/api/records/1.0/search/"
+    ),
+    "vacances_fraicheur_s": 24 * 3600,
+    "vacances_delai_nouvel_essai_s": 300,
+    "vacances_tentatives": 3,
+    "zone_vacances": os.getenv("COLLOSCOPE_ZONE_VACANCES", "C"),
+    # Zones récupérées ensemble (année en cours et suivante), en parallèle
+    "zones_vacances": tuple(os.getenv("COLLOSCOPE_ZONES_VACANCES", "A,B,C").split(",")),
+    "vacances_fils": 6,
+    "duree_colle_minutes": 60,
+    "metriques_echantillons": 1000,
+    "logo_largeur_px": 120,
+    "eps_largeur_px": 1000,
+    "lignes_vides_max": 50,
+    # Classes servies par une feuille Google Sheets : COLLOSCOPE_SHEETS="1=<id>,MPSI=<id>"
+    "sheets_classes": dict(
+        paire.split("=", 1) for paire in os.getenv("COLLOSCOPE_SHEETS", "").split(",") if "=" in paire
+    ),
+    # Onglets lus par un seul values.batchGet : colloscope puis légende
+    "sheets_plages": ("Colloscope", "Legende"),
+    "sheets_api_url": os.getenv("COLLOSCOPE_SHEETS_API_URL", "https://sheets.googleapis.com"),
+    "drive_api_url": os.getenv("COLLOSCOPE_DRIVE_API_URL", "https://www.googleapis.com"),
+    # Vide : requêtes sans authentification (serveur Sheets factice)
+    "sheets_compte_service": os.getenv("COLLOSCOPE_COMPTE_SERVICE", "colloscopeprepatsi-438b460546e7.json"),
+    "sheets_fraicheur_s": 60,
+    # Matières dont une même clé est partagée par plusieurs groupes (TP d'informatique
+    # en demi-classe...) : toute autre clé attribuée deux fois la même semaine est signalée
+    "prefixes_collectifs": tuple(
+        prefixe for prefixe in os.getenv("COLLOSCOPE_PREFIXES_COLLECTIFS", "I").split(",") if prefixe
+    ),
+    # Écart signalé quand il dépasse ce multiple de l'écart médian de la matière
+    "facteur_ecart_rotation": 2,
+    # Chargement de toutes les classes en arrière-plan dès la première exécution du processus
+    "prechauffage": os.getenv("COLLOSCOPE_PRECHAUFFAGE", "1") != "0",
 }
 
+# À incrémenter dès que la structure des instantanés change
+FORMAT_INSTANTANE = 3
+
 OWNER_CODE = os.getenv("COLLOSCOPE_OWNER_CODE", "debug123")
 
 MATIERES_MAP = {
@@ -41,6 +102,11 @@ MATIERES_MAP = {
     'PHI': "Philosophie",
 }
 
+# Préfixes les plus longs d'abord ("PHI" avant "P"), triés une seule fois
+PREFIXES_MATIERES = sorted(MATIERES_MAP.keys(), key=len, reverse=True)
+
+COLONNES_TABLEAU = ["Professeur", "Jour", "Heure", "Salle", "Matière"]
+
 # ============================================================================
 # UTILITAIRES
 # ============================================================================
@@ -51,6 +117,10 @@ def chemin_ressource(chemin_relatif: str) -> str:
 def aplatir_liste(liste_imbriquee: List[List[str]]) -> List[str]:
     return [' '.join(sous_liste) for sous_liste in liste_imbriquee]
 
+def champs_legende(elements: List[str]) -> List[str]:
+    # Professeur, jour, heure, salle : complétés à vide si la légende est incomplète
+    return (elements[:4] + [""] * 4)[:4]
+
 def extract_date(cell_str: str, year: int) -> Optional[datetime]:
     match = re.search(r'\((\d{2}/\d{2})\)', str(cell_str))
     if match:
@@ -75,232 +145,1530 @@ def detecter_annee_scolaire_actuelle(date_actuelle: Optional[datetime] = None) -
     else:
         return f"{annee - 1}-{annee}"
 
+def annee_scolaire_suivante(annee_scolaire_str: str) -> str:
+    annee_debut = int(annee_scolaire_str.split('-')[0]) + 1
+    return f"{annee_debut}-{annee_debut + 1}"
+
+def annee_scolaire_valide(annee_scolaire_str: str) -> bool:
+    # "2024-2025", années consécutives : l'année entre dans les noms des fichiers du cache
+    match = re.fullmatch(r"(\d{4})-(\d{4})", annee_scolaire_str)
+    return match is not None and int(match.group(2)) == int(match.group(1)) + 1
+
 def determiner_matiere(cle: str) -> str:
-    for prefix in sorted(MATIERES_MAP.keys(), key=len, reverse=True):
+    for prefix in PREFIXES_MATIERES:
         if cle.startswith(prefix):
             return MATIERES_MAP[prefix]
     return "Non spécifié"
 
+def cle_collective(cle: str) -> bool:
+    prefixe = next((prefix for prefix in PREFIXES_MATIERES if cle.startswith(prefix)), None)
+    return prefixe in CONFIG["prefixes_collectifs"]
+
 # ============================================================================
-# CHARGEMENT DES DONNÉES
+# INSTRUMENTATION
+# ============================================================================
+
+# Durées (fenêtre glissante) et défauts de cache par étape, partagés par
+# toutes les sessions du processus.
+class Metriques:
+    ETAPES_EN_CACHE = ("charger_donnees", "obtenir_vacances", "creer_tableau")
+
+    def __init__(self, taille_echantillon: int):
+        self.taille_echantillon = taille_echantillon
+        self._verrou = threading.Lock()
+        self.durees: Dict[str, deque] = {}
+        self.appels: Dict[str, int] = {}
+        self.totaux_ms: Dict[str, float] = {}
+        self.manques: Dict[str, int] = {}
+
+    def reinitialiser(self) -> None:
+        with self._verrou:
+            self.durees.clear()
+            self.appels.clear()
+            self.totaux_ms.clear()
+            self.manques.clear()
+
+    def enregistrer(self, nom: str, duree_ms: float) -> None:
+        with self._verrou:
+            if nom not in self.durees:
+                self.durees[nom] = deque(maxlen=self.taille_echantillon)
+            self.durees[nom].append(duree_ms)
+            self.appels[nom] = self.appels.get(nom, 0) + 1
+            self.totaux_ms[nom] = self.totaux_ms.get(nom, 0.0) + duree_ms
+
+    def compter_manque(self, nom: str) -> None:
+        with self._verrou:
+            self.manques[nom] = self.manques.get(nom, 0) + 1
+
+    @staticmethod
+    def quantile(valeurs: List[float], q: float) -> float:
+        if not valeurs:
+            return 0.0
+        return valeurs[min(len(valeurs) - 1, int(q * len(valeurs)))]
+
+    def resume(self) -> List[Dict]:
+        with self._verrou:
+            echantillons = {nom: sorted(durees) for nom, durees in self.durees.items()}
+            appels, totaux, manques = dict(self.appels), dict(self.totaux_ms), dict(self.manques)
+        return [
+            {
+                "etape": nom,
+                "appels": appels[nom],
+                "manques_cache": manques.get(nom, 0),
+                "succes_cache": appels[nom] - manques.get(nom, 0) if nom in self.ETAPES_EN_CACHE else None,
+                "p50_ms": round(self.quantile(valeurs, 0.50), 3),
+                "p95_ms": round(self.quantile(valeurs, 0.95), 3),
+                "total_ms": round(totaux[nom], 3),
+            }
+            for nom, valeurs in sorted(echantillons.items())
+        ]
+
+    def exporter_json(self) -> str:
+        return json.dumps({"horodatage": datetime.now().isoformat(), "etapes": self.resume()}, indent=2)
+
+    def exporter_prometheus(self) -> str:
+        lignes = [
+            "# HELP colloscope_duree_ms Durée des étapes du rendu en millisecondes.",
+            "# TYPE colloscope_duree_ms summary",
+        ]
+        resume = self.resume()
+        for etape in resume:
+            etiquette = f'etape="{etape["etape"]}"'
+            lignes.append(f'colloscope_duree_ms{{{etiquette},quantile="0.5"}} {etape["p50_ms"]}')
+            lignes.append(f'colloscope_duree_ms{{{etiquette},quantile="0.95"}} {etape["p95_ms"]}')
+            lignes.append(f'colloscope_duree_ms_sum{{{etiquette}}} {etape["total_ms"]}')
+            lignes.append(f'colloscope_duree_ms_count{{{etiquette}}} {etape["appels"]}')
+        lignes.append("# HELP colloscope_cache_manques_total Appels non servis par le cache.")
+        lignes.append("# TYPE colloscope_cache_manques_total counter")
+        for etape in resume:
+            if etape["succes_cache"] is not None:
+                lignes.append(f'colloscope_cache_manques_total{{etape="{etape["etape"]}"}} {etape["manques_cache"]}')
+        return "\n".join(lignes) + "\n"
+
+@st.cache_resource
+def metriques() -> Metriques:
+    return Metriques(CONFIG["metriques_echantillons"])
+
+@contextmanager
+def mesurer(nom: str):
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        metriques().enregistrer(nom, (time.perf_counter() - debut) * 1000)
+
+def instrumenter(nom: str):
+    def decorateur(fonction):
+        @wraps(fonction)
+        def fonction_mesuree(*args, **kwargs):
+            with mesurer(nom):
+                return fonction(*args, **kwargs)
+        return fonction_mesuree
+    return decorateur
+
+# ============================================================================
+# LECTURE DES CLASSEURS
+# ============================================================================
+
+def lire_lignes(fichier: str) -> List[Tuple]:
+    # Mode lecture seule : les lignes sont lues en flux, sans matérialiser
+    # les objets cellule, et le classeur est fermé explicitement.
+    from openpyxl import load_workbook
+
+    classeur = load_workbook(fichier, read_only=True, data_only=True)
+    try:
+        lignes: List[Tuple] = []
+        vides_en_attente = 0
+        for row in classeur.active.iter_rows(values_only=True):
+            if all(cell is None for cell in row):
+                vides_en_attente += 1
+                # Fin du tableau : le reste de la feuille n'est que mise en forme
+                if vides_en_attente >= CONFIG["lignes_vides_max"]:
+                    break
+                continue
+            lignes.extend([()] * vides_en_attente)
+            vides_en_attente = 0
+            lignes.append(row)
+    finally:
+        classeur.close()
+
+    # Élagage des colonnes vides en fin de tableau
+    largeur = max(
+        (max((i + 1 for i, cell in enumerate(row) if cell is not None), default=0) for row in lignes),
+        default=0,
+    )
+    return [tuple(row[:largeur]) + (None,) * (largeur - len(row)) for row in lignes]
+
+def lire_classeurs(fichier_colloscope: str, fichier_legende: str, annee_numerique: int) -> Tuple[Dict, Dict, List]:
+    return interpreter_lignes(lire_lignes(fichier_colloscope), lire_lignes(fichier_legende), annee_numerique)
+
+def interpreter_lignes(lignes_colloscope: List[Tuple], lignes_legende: List[Tuple],
+                       annee_numerique: int) -> Tuple[Dict, Dict, List]:
+    dictionnaire_donnees: Dict[str, List] = {}
+    dates_semaines: List[Optional[datetime]] = []
+
+    # Lecture de la ligne d'en-tête pour les dates (ligne 1)
+    premiere_ligne = lignes_colloscope[0] if lignes_colloscope else ()
+    for cell_val in premiere_ligne[1:]:  # Ignorer la première colonne (groupes)
+        if cell_val is not None:
+            # Janvier à août appartiennent à la seconde année civile de l'année scolaire
+            date_semaine = extract_date(str(cell_val), annee_numerique + 1)
+            if date_semaine is not None and date_semaine.month >= CONFIG["school_year_start_month"]:
+                date_semaine = date_semaine.replace(year=annee_numerique)
+            dates_semaines.append(date_semaine)
+
+    # Lecture des données groupes
+    for row in lignes_colloscope[1:]:
+        if row and row[0] is not None:
+            groupe = str(row[0]).strip()
+            donnees_groupe = []
+            for cell in row[1:]:
+                if cell is not None:
+                    donnees_groupe.append(str(cell).strip())
+                else:
+                    donnees_groupe.append("")
+            dictionnaire_donnees[groupe] = donnees_groupe
+
+    # Lecture de la légende
+    dictionnaire_legende: Dict[str, List] = {}
+    for row in lignes_legende[1:]:
+        if row and row[0] is not None:
+            cle = str(row[0]).strip()
+            valeurs = []
+            for cell in row[1:]:
+                if cell is not None:
+                    valeurs.append([str(cell).strip()])
+            dictionnaire_legende[cle] = valeurs
+
+    return dictionnaire_donnees, dictionnaire_legende, dates_semaines
+
+# ============================================================================
+# GOOGLE SHEETS
+# ============================================================================
+
+# Accès en lecture seule : valeurs des feuilles et numéro de révision Drive
+SCOPES_GOOGLE = (
+    "https://www.googleapis.com/auth/spreadsheets.readonly",
+    "https://www.googleapis.com/auth/drive.metadata.readonly",
+)
+
+def feuille_classe(classe: str) -> Optional[str]:
+    return CONFIG["sheets_classes"].get(classe)
+
+def normaliser_valeurs(valeurs: List[List]) -> List[Tuple]:
+    # Même forme que lire_lignes : cellules vides à None, lignes de largeur égale
+    largeur = max((len(ligne) for ligne in valeurs), default=0)
+    return [
+        tuple(None if cellule == "" else cellule for cellule in ligne) + (None,) * (largeur - len(ligne))
+        for ligne in valeurs
+    ]
+
+# Révision Drive de chaque feuille, revérifiée en arrière-plan au plus toutes les
+# sheets_fraicheur_s secondes : une page lit la dernière révision connue sans
+# attendre l'API, et tant qu'elle ne change pas, les caches et l'instantané restent valides.
+class ClientSheets:
+    def __init__(self, session: "requests.Session"):
+        self.session = session
+        self.revisions: Dict[str, Tuple[Optional[str], float]] = {}
+        self.erreurs: Dict[str, str] = {}
+        self._identifiants = None
+        self._verrou = threading.Lock()
+        self._en_cours: set = set()
+        self._verrou_revisions = threading.Lock()
+        self._executeur = ThreadPoolExecutor(max_workers=2, thread_name_prefix="sheets")
+
+    def _entetes(self) -> Dict[str, str]:
+        if not CONFIG["sheets_compte_service"]:
+            return {}
+        with self._verrou:
+            if self._identifiants is None:
+                from google.oauth2 import service_account
+
+                self._identifiants = service_account.Credentials.from_service_account_file(
+                    chemin_ressource(CONFIG["sheets_compte_service"]), scopes=SCOPES_GOOGLE
+                )
+            if not self._identifiants.valid:
+                from google.auth.transport.requests import Request
+
+                self._identifiants.refresh(Request(self.session))
+            return {"Authorization": f"Bearer {self._identifiants.token}"}
+
+    def lire_revision(self, identifiant: str) -> str:
+        response = self.session.get(
+            f"{CONFIG['drive_api_url']}/drive/v3/files/{identifiant}",
+            params={"fields": "version"}, headers=self._entetes(), timeout=10,
+        )
+        response.raise_for_status()
+        return str(response.json()["version"])
+
+    def revision(self, identifiant: str) -> Optional[str]:
+        # None : révision pas encore obtenue (premier appel du processus, API injoignable)
+        connue = self.revisions.get(identifiant)
+        if connue is None or time.time() - connue[1] >= CONFIG["sheets_fraicheur_s"]:
+            self._verifier_en_arriere_plan(identifiant)
+        return connue[0] if connue is not None else None
+
+    def actualiser(self, identifiant: str) -> Optional[str]:
+        # Lecture bloquante, réservée aux chemins qui interrogent déjà l'API (compilation)
+        try:
+            revision = self.lire_revision(identifiant)
+            self.erreurs.pop(identifiant, None)
+        except Exception as e:
+            self.erreurs[identifiant] = str(e)
+            # Dernière révision connue conservée, revérifiée au prochain délai
+            connue = self.revisions.get(identifiant)
+            revision = connue[0] if connue is not None else None
+        self.revisions[identifiant] = (revision, time.time())
+        return revision
+
+    def _verifier_en_arriere_plan(self, identifiant: str) -> None:
+        # Une seule vérification par feuille à la fois, quel que soit le nombre de sessions
+        with self._verrou_revisions:
+            if identifiant in self._en_cours:
+                return
+            self._en_cours.add(identifiant)
+        self._executeur.submit(self._verifier, identifiant)
+
+    def _verifier(self, identifiant: str) -> None:
+        try:
+            self.actualiser(identifiant)
+        finally:
+            with self._verrou_revisions:
+                self._en_cours.discard(identifiant)
+
+    def oublier(self, identifiant: str) -> None:
+        self.revisions.pop(identifiant, None)
+
+    def lire_plages(self, identifiant: str) -> List[List[Tuple]]:
+        # Colloscope et légende en une seule requête
+        response = self.session.get(
+            f"{CONFIG['sheets_api_url']}/v4/spreadsheets/{identifiant}/values:batchGet",
+            params={"ranges": list(CONFIG["sheets_plages"]), "majorDimension": "ROWS"},
+            headers=self._entetes(), timeout=30,
+        )
+        response.raise_for_status()
+        plages = response.json().get("valueRanges", [])
+        if len(plages) != len(CONFIG["sheets_plages"]):
+            raise ValueError(f"Réponse incomplète pour la feuille {identifiant} : {len(plages)} plage(s).")
+        return [normaliser_valeurs(plage.get("values", [])) for plage in plages]
+
+@st.cache_resource
+def client_sheets() -> ClientSheets:
+    return ClientSheets(session_http())
+
+def lire_feuille(identifiant: str, annee_numerique: int) -> Tuple[Dict, Dict, List]:
+    lignes_colloscope, lignes_legende = client_sheets().lire_plages(identifiant)
+    return interpreter_lignes(lignes_colloscope, lignes_legende, annee_numerique)
+
+# ============================================================================
+# INSTANTANÉS COMPILÉS
 # ============================================================================
 
-@st.cache_data(ttl=3600)
-def charger_donnees(classe: str, annee_scolaire_str: str) -> Tuple[Dict, Dict, List]:
+def fichiers_classe(classe: str) -> Tuple[str, str]:
+    return f'Colloscope{classe}.xlsx', f'Legende{classe}.xlsx'
+
+def signature_fichier(chemin: str) -> Dict:
+    stat = os.stat(chemin)
+    with open(chemin, 'rb') as f:
+        empreinte = hashlib.sha256(f.read()).hexdigest()
+    return {"mtime_ns": stat.st_mtime_ns, "taille": stat.st_size, "sha256": empreinte}
+
+def fichier_inchange(chemin: str, signature: Dict) -> bool:
+    stat = os.stat(chemin)
+    if stat.st_mtime_ns == signature["mtime_ns"] and stat.st_size == signature["taille"]:
+        return True
+    # mtime modifié (copie, checkout git...) : on tranche sur le contenu
+    return signature_fichier(chemin)["sha256"] == signature["sha256"]
+
+def source_inchangee(nom: str, signature: Dict) -> bool:
+    if nom.startswith("sheets:"):
+        revision = client_sheets().revision(nom[len("sheets:"):])
+        # Révision pas encore connue ou API injoignable : le dernier instantané reste servi
+        return revision is None or revision == signature["revision"]
+    return fichier_inchange(chemin_ressource(nom), signature)
+
+def chemin_instantane(classe: str, annee_scolaire_str: str) -> str:
+    # Classe et année entrent dans le chemin : seules les valeurs connues sont acceptées
+    if classe not in decouvrir_classes():
+        raise ValueError(f"Classe inconnue : '{classe}'")
+    if not annee_scolaire_valide(annee_scolaire_str):
+        raise ValueError(f"Année scolaire invalide : '{annee_scolaire_str}'")
+    return chemin_ressource(os.path.join(CONFIG["dossier_cache"], f"colloscope{classe}_{annee_scolaire_str}.mmap"))
+
+# Instantané partagé par tous les processus du serveur : un en-tête, des métadonnées
+# JSON (signatures des sources, dates, position de chaque entrée) puis les valeurs,
+# encodées une à une. Chaque worker projette le fichier en lecture seule : une seule
+# analyse des classeurs par version, et les pages du fichier sont communes.
+# Seules les données brutes sont partagées : chaque lecture redécode sa valeur, et les
+# structures dérivées (index, grille, calendriers) restent construites par chaque
+# processus, une fois par version ; ce sont elles que les pages consultent.
+MAGIC_INSTANTANE = b"COLLOSCOPE-MMAP\0"
+ENTETE_INSTANTANE = struct.Struct("<16sIQ")
+
+class CarteProjetee(Mapping):
+    def __init__(self, projection: mmap.mmap, base: int, entrees: List[List], conversion):
+        self._projection = projection
+        self._positions = {cle: (base + debut, base + debut + taille) for cle, debut, taille in entrees}
+        self._conversion = conversion
+
+    def __getitem__(self, cle: str):
+        # Décodée à chaque accès, sans copie gardée en mémoire
+        debut, fin = self._positions[cle]
+        return self._conversion(json.loads(self._projection[debut:fin]))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._positions)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, cle: object) -> bool:
+        return cle in self._positions
+
+def convertir_semaines(valeurs: List) -> Tuple[str, ...]:
+    return tuple(valeurs)
+
+def convertir_legende(valeurs: List) -> Tuple[Tuple[str, ...], ...]:
+    return tuple(tuple(valeur) for valeur in valeurs)
+
+@contextmanager
+def verrou_instantane(chemin: str) -> Iterator[None]:
+    # Un seul processus compile une version donnée ; les autres attendent puis la projettent
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    with open(f"{chemin}.lock", 'w') as verrou:
+        fcntl.flock(verrou, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(verrou, fcntl.LOCK_UN)
+
+def ecrire_instantane(chemin: str, sources: Dict, donnees: Tuple[Dict, Dict, List]) -> None:
+    dictionnaire_donnees, dictionnaire_legende, dates_semaines = donnees
+    valeurs = bytearray()
+    sections = {}
+    for nom, dictionnaire in (("donnees", dictionnaire_donnees), ("legende", dictionnaire_legende)):
+        entrees = []
+        for cle, valeur in dictionnaire.items():
+            contenu = json.dumps(valeur, ensure_ascii=False).encode("utf-8")
+            entrees.append([cle, len(valeurs), len(contenu)])
+            valeurs += contenu
+        sections[nom] = entrees
+    metadonnees = json.dumps({
+        "sources": sources,
+        "dates": [d.isoformat() if d else None for d in dates_semaines],
+        "sections": sections,
+    }, ensure_ascii=False).encode("utf-8")
+
+    # Publication atomique : les workers qui projettent l'ancien fichier le gardent intact
+    chemin_tmp = f"{chemin}.{os.getpid()}.tmp"
+    try:
+        with open(chemin_tmp, 'wb') as f:
+            f.write(ENTETE_INSTANTANE.pack(MAGIC_INSTANTANE, FORMAT_INSTANTANE, len(metadonnees)))
+            f.write(metadonnees)
+            f.write(valeurs)
+        os.replace(chemin_tmp, chemin)
+    finally:
+        if os.path.exists(chemin_tmp):
+            os.remove(chemin_tmp)
+
+def charger_instantane(classe: str, annee_scolaire_str: str) -> Optional["DonneesClasse"]:
+    try:
+        with open(chemin_instantane(classe, annee_scolaire_str), 'rb') as f:
+            projection = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # Absent, vide ou illisible : il sera recompilé
+        return None
+
+    try:
+        magic, format_instantane, taille = ENTETE_INSTANTANE.unpack_from(projection, 0)
+        if magic != MAGIC_INSTANTANE or format_instantane != FORMAT_INSTANTANE:
+            return None
+        base = ENTETE_INSTANTANE.size + taille
+        metadonnees = json.loads(projection[ENTETE_INSTANTANE.size:base])
+        for nom, signature in metadonnees["sources"].items():
+            if not source_inchangee(nom, signature):
+                return None
+        return DonneesClasse(
+            CarteProjetee(projection, base, metadonnees["sections"]["donnees"], convertir_semaines),
+            CarteProjetee(projection, base, metadonnees["sections"]["legende"], convertir_legende),
+            tuple(datetime.fromisoformat(d) if d else None for d in metadonnees["dates"]),
+        )
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+def compiler_instantane(classe: str, annee_scolaire_str: str) -> "DonneesClasse":
+    chemin = chemin_instantane(classe, annee_scolaire_str)
+    try:
+        with verrou_instantane(chemin):
+            # Un autre processus a pu publier cette version pendant l'attente du verrou
+            donnees = charger_instantane(classe, annee_scolaire_str)
+            if donnees is not None:
+                return donnees
+            sources, lues = lire_sources(classe, annee_scolaire_str)
+            ecrire_instantane(chemin, sources, lues)
+    except OSError:
+        # Système de fichiers en lecture seule : les données restent servies depuis la mémoire
+        return figer_donnees(*lire_sources(classe, annee_scolaire_str)[1])
+    return charger_instantane(classe, annee_scolaire_str) or figer_donnees(*lues)
+
+def lire_sources(classe: str, annee_scolaire_str: str) -> Tuple[Dict, Tuple[Dict, Dict, List]]:
     annee_numerique = int(annee_scolaire_str.split('-')[0])
-    fichier_colloscope = chemin_ressource(f'Colloscope{classe}.xlsx')
-    fichier_legende = chemin_ressource(f'Legende{classe}.xlsx')
+    fichier_colloscope, fichier_legende = fichiers_classe(classe)
+    identifiant = feuille_classe(classe)
 
+    # Signatures relevées avant la lecture : une modification pendant la
+    # compilation invalidera l'instantané au prochain chargement.
+    if identifiant is not None:
+        sources = {f"sheets:{identifiant}": {"revision": client_sheets().actualiser(identifiant)}}
+        return sources, lire_feuille(identifiant, annee_numerique)
+    sources = {nom: signature_fichier(chemin_ressource(nom)) for nom in (fichier_colloscope, fichier_legende)}
+    return sources, lire_classeurs(chemin_ressource(fichier_colloscope), chemin_ressource(fichier_legende), annee_numerique)
+
+# ============================================================================
+# CHARGEMENT DES DONNÉES
+# ============================================================================
+
+def decouvrir_classes() -> List[str]:
+    # Le mtime du dossier change à chaque ajout/suppression de classeur
+    return _decouvrir_classes_version(os.stat(chemin_ressource(".")).st_mtime_ns, tuple(CONFIG["sheets_classes"]))
+
+@st.cache_data(max_entries=1)
+def _decouvrir_classes_version(version_dossier: int, classes_sheets: Tuple[str, ...]) -> List[str]:
+    classes = []
+    for chemin in Path(chemin_ressource(".")).glob("Colloscope*.xlsx"):
+        classe = chemin.stem[len("Colloscope"):]
+        if classe and (chemin.parent / f"Legende{classe}.xlsx").exists():
+            classes.append(classe)
+    # Une feuille Google Sheets l'emporte sur les classeurs du même nom
+    classes.extend(classe for classe in classes_sheets if classe not in classes)
+    # Tri naturel : "2" avant "10", puis les classes nommées (MPSI, PCSI...)
+    return sorted(classes, key=lambda c: (not c.isdigit(), int(c) if c.isdigit() else 0, c))
+
+def libelle_classe(classe: str) -> str:
+    return f"TSI{classe}" if classe.isdigit() else classe
+
+def version_classe(classe: str) -> str:
+    identifiant = feuille_classe(classe)
+    if identifiant is not None:
+        # Révision Drive, revérifiée au plus une fois par délai de fraîcheur
+        return f"sheets:{client_sheets().revision(identifiant) or 'hors-ligne'}"
+    # Jeton bon marché (un stat par fichier) : change dès qu'un classeur est remplacé
+    parties = []
+    for nom in fichiers_classe(classe):
+        try:
+            stat = os.stat(chemin_ressource(nom))
+            parties.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+        except OSError:
+            parties.append("absent")
+    return "-".join(parties)
+
+# Version servie d'une classe, partagée telle quelle par toutes les sessions
+# du processus (st.cache_resource : pas de copie par session). Projetée depuis
+# l'instantané, elle décode ses valeurs à la lecture.
+# Se déballe comme l'ancien tuple (donnees, legende, dates).
+class DonneesClasse(NamedTuple):
+    dictionnaire_donnees: Mapping[str, Tuple[str, ...]]
+    dictionnaire_legende: Mapping[str, Tuple[Tuple[str, ...], ...]]
+    dates_semaines: Tuple[Optional[datetime], ...]
+
+def figer_donnees(dictionnaire_donnees: Dict, dictionnaire_legende: Dict, dates_semaines: List) -> DonneesClasse:
+    return DonneesClasse(
+        MappingProxyType({groupe: tuple(semaines) for groupe, semaines in dictionnaire_donnees.items()}),
+        MappingProxyType({cle: tuple(tuple(valeur) for valeur in valeurs) for cle, valeurs in dictionnaire_legende.items()}),
+        tuple(dates_semaines),
+    )
+
+DONNEES_VIDES = figer_donnees({}, {}, [])
+
+@instrumenter("charger_donnees")
+def charger_donnees(classe: str, annee_scolaire_str: str) -> DonneesClasse:
+    # Manque compté là où l'appel est chronométré : classe pas encore servie par ce processus
+    if (classe, annee_scolaire_str) not in versions().servies:
+        metriques().compter_manque("charger_donnees")
+    return donnees_version(classe, annee_scolaire_str, version_servie(classe, annee_scolaire_str))
+
+def donnees_version(classe: str, annee_scolaire_str: str, version: str) -> DonneesClasse:
+    # Les structures dérivées lisent les données d'une version précise : celle que
+    # détient le gestionnaire (servie ou en préparation), sinon le cache de chargement
+    donnees = versions().donnees(classe, annee_scolaire_str, version)
+    if donnees is None:
+        donnees, _ = _charger_donnees_version(classe, annee_scolaire_str, version.split("+")[0])
+    return donnees
+
+@st.cache_resource(max_entries=CONFIG["classes_en_memoire"])
+def _charger_donnees_version(classe: str, annee_scolaire_str: str, version: str) -> Tuple[DonneesClasse, Optional[str]]:
+    # Renvoie (données, erreur) : l'échec est affiché une fois par la page, pas ici
+    # (un st.error mis en cache serait rejoué à chaque lecture, threads compris)
     try:
-        excel_colloscope = load_workbook(fichier_colloscope, data_only=True)
-        excel_legende = load_workbook(fichier_legende, data_only=True)
-
-        feuille_colloscope = excel_colloscope.active
-        feuille_legende = excel_legende.active
-
-        dictionnaire_donnees: Dict[str, List] = {}
-        dates_semaines: List[Optional[datetime]] = []
-
-        # Lecture de la ligne d'en-tête pour les dates (ligne 1)
-        premiere_ligne = list(feuille_colloscope.iter_rows(min_row=1, max_row=1, values_only=True))[0]
-        for cell_val in premiere_ligne[1:]:  # Ignorer la première colonne (groupes)
-            if cell_val is not None:
-                date = extract_date(str(cell_val), annee_numerique)
-                dates_semaines.append(date)
-
-        # Lecture des données groupes
-        for row in feuille_colloscope.iter_rows(min_row=2, values_only=True):
-            if row[0] is not None:
-                groupe = str(row[0]).strip()
-                donnees_groupe = []
-                for cell in row[1:]:
-                    if cell is not None:
-                        donnees_groupe.append(str(cell).strip())
-                    else:
-                        donnees_groupe.append("")
-                dictionnaire_donnees[groupe] = donnees_groupe
-
-        # Lecture de la légende
-        dictionnaire_legende: Dict[str, List] = {}
-        for row in feuille_legende.iter_rows(min_row=2, values_only=True):
-            if row[0] is not None:
-                cle = str(row[0]).strip()
-                valeurs = []
-                for cell in row[1:]:
-                    if cell is not None:
-                        valeurs.append([str(cell).strip()])
-                dictionnaire_legende[cle] = valeurs
-
-        return dictionnaire_donnees, dictionnaire_legende, dates_semaines
+        # Étape propre : atteinte aussi par les index, le préchauffage et les bascules
+        with mesurer("lire_donnees"):
+            # Données brutes projetées depuis l'instantané partagé entre processus
+            return charger_instantane(classe, annee_scolaire_str) or compiler_instantane(classe, annee_scolaire_str), None
 
     except FileNotFoundError as e:
-        st.error(f"❌ Fichier manquant : {e}")
-        return {}, {}, []
+        return DONNEES_VIDES, f"Fichier manquant : {os.path.basename(e.filename or str(e))}"
     except Exception as e:
-        st.error(f"❌ Erreur lors du chargement : {e}")
-        return {}, {}, []
+        return DONNEES_VIDES, f"Erreur lors du chargement : {e}"
 
-@st.cache_data(ttl=3600)
-def obtenir_vacances(zone: str = "C", annee_scolaire_str: Optional[str] = None) -> List[Tuple]:
-    if annee_scolaire_str is None:
-        annee_scolaire_str = detecter_annee_scolaire_actuelle()
+# ============================================================================
+# RECHARGEMENT À CHAUD
+# ============================================================================
 
-    url = "https://data.education.gouv.fr/api/records/1.0/search/"
-    params = {
-        "dataset": "fr-en-calendrier-scolaire",
-        "rows": 500,
-        "refine.zone": f"Zone {zone}",
-        "refine.annee_scolaire": annee_scolaire_str,
+def differ_donnees(ancien: DonneesClasse, nouveau: DonneesClasse) -> Dict:
+    cellules = []
+    for groupe, apres in nouveau.dictionnaire_donnees.items():
+        avant = ancien.dictionnaire_donnees.get(groupe)
+        if avant is None:
+            continue
+        for semaine in range(1, max(len(avant), len(apres)) + 1):
+            cle_avant = avant[semaine - 1] if semaine <= len(avant) else ""
+            cle_apres = apres[semaine - 1] if semaine <= len(apres) else ""
+            if cle_avant != cle_apres:
+                cellules.append({"groupe": groupe, "semaine": semaine, "avant": cle_avant, "apres": cle_apres})
+
+    legende_avant, legende_apres = ancien.dictionnaire_legende, nouveau.dictionnaire_legende
+    cles_modifiees = sorted(cle for cle in legende_apres if cle in legende_avant and legende_avant[cle] != legende_apres[cle])
+    cles_ajoutees = sorted(cle for cle in legende_apres if cle not in legende_avant)
+    cles_supprimees = sorted(cle for cle in legende_avant if cle not in legende_apres)
+
+    # Groupes dont les tableaux changent : cases modifiées ou clés de légende touchées
+    cles_touchees = set(cles_modifiees) | set(cles_ajoutees) | set(cles_supprimees)
+    groupes_affectes = {cellule["groupe"] for cellule in cellules}
+    groupes_affectes.update(
+        groupe for groupe, semaines in nouveau.dictionnaire_donnees.items()
+        if groupe not in ancien.dictionnaire_donnees
+        or any(cle in cles_touchees for cle_semaine in semaines for cle in cle_semaine.split())
+    )
+
+    dates_avant, dates_apres = ancien.dates_semaines, nouveau.dates_semaines
+    return {
+        "groupes_ajoutes": [groupe for groupe in nouveau.dictionnaire_donnees if groupe not in ancien.dictionnaire_donnees],
+        "groupes_supprimes": [groupe for groupe in ancien.dictionnaire_donnees if groupe not in nouveau.dictionnaire_donnees],
+        "cellules": cellules,
+        "cles_ajoutees": cles_ajoutees,
+        "cles_supprimees": cles_supprimees,
+        "cles_modifiees": cles_modifiees,
+        "semaines_redatees": [
+            semaine for semaine in range(1, max(len(dates_avant), len(dates_apres)) + 1)
+            if (dates_avant[semaine - 1] if semaine <= len(dates_avant) else None)
+            != (dates_apres[semaine - 1] if semaine <= len(dates_apres) else None)
+        ],
+        "groupes_affectes": sorted(groupes_affectes),
     }
-    vacances = []
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        for record in data.get("records", []):
-            fields = record.get("fields", {})
-            start_str = fields.get("start_date")
-            end_str = fields.get("end_date")
-            if start_str and end_str:
+
+def diff_vide(diff: Dict) -> bool:
+    return not any(valeurs for nom, valeurs in diff.items() if nom != "groupes_affectes")
+
+# Version servie de chaque classe. Une nouvelle version des classeurs est analysée
+# hors du chemin des requêtes, comparée à celle servie, puis basculée d'un coup :
+# en attendant, les pages continuent de lire l'ancienne, complète et cohérente.
+class GestionnaireVersions:
+    def __init__(self, classes_en_memoire: int):
+        # Classes les moins récemment servies évincées, comme les caches de chargement
+        self.classes_en_memoire = classes_en_memoire
+        self.servies: "OrderedDict[Tuple[str, str], Tuple[str, DonneesClasse]]" = OrderedDict()
+        self.en_preparation: Dict[Tuple[str, str], Tuple[str, DonneesClasse]] = {}
+        # Par classe, seule la dernière version des fichiers compte :
+        # (version des fichiers, version servie au contenu identique)
+        self.alias: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        # (version des fichiers, erreur) du dernier chargement ou de la dernière préparation échoués
+        self.echecs: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        # Ancienne version et groupes affectés, pour les reconstructions partielles
+        self.transitions: Dict[Tuple[str, str, str], Tuple[str, List[str]]] = {}
+        self.journal: deque = deque(maxlen=20)
+        self._rechargements = 0
+        self._verrou = threading.Lock()
+        self._executeur = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rechargement")
+
+    def version(self, classe: str, annee_scolaire_str: str) -> str:
+        cle = (classe, annee_scolaire_str)
+        version_disque = version_classe(classe)
+        with self._verrou:
+            servie = self.servies.get(cle)
+            if servie is not None:
+                self.servies.move_to_end(cle)
+        if servie is None:
+            # Premier chargement : rien d'autre à servir, on attend les données
+            donnees, erreur = _charger_donnees_version(classe, annee_scolaire_str, version_disque)
+            if erreur is not None:
+                self.echecs[cle] = (version_disque, erreur)
+                return version_disque
+            with self._verrou:
+                self.echecs.pop(cle, None)
+                servie = self.servies.setdefault(cle, (version_disque, donnees))
+                self._evincer()
+            return servie[0]
+        if version_disque != servie[0].split("+")[0] and self.alias.get(cle) != (version_disque, servie[0]):
+            self._preparer(classe, annee_scolaire_str, version_disque)
+        return servie[0]
+
+    def _evincer(self) -> None:
+        # Appelé sous le verrou
+        while len(self.servies) > self.classes_en_memoire:
+            cle, _ = self.servies.popitem(last=False)
+            self.alias.pop(cle, None)
+            self.echecs.pop(cle, None)
+
+    def erreur(self, classe: str, annee_scolaire_str: str) -> Optional[str]:
+        # Échec du premier chargement ; celui d'une relecture laisse l'ancienne version servie
+        cle = (classe, annee_scolaire_str)
+        if cle in self.servies or cle not in self.echecs:
+            return None
+        return self.echecs[cle][1]
+
+    def donnees(self, classe: str, annee_scolaire_str: str, version: str) -> Optional[DonneesClasse]:
+        cle = (classe, annee_scolaire_str)
+        for entree in (self.servies.get(cle), self.en_preparation.get(cle)):
+            if entree is not None and entree[0] == version:
+                return entree[1]
+        return None
+
+    def recharger(self, classe: str, annee_scolaire_str: str) -> None:
+        # Relecture forcée (instantané ignoré), même si les fichiers n'ont pas changé
+        if (classe, annee_scolaire_str) not in self.servies:
+            self.version(classe, annee_scolaire_str)
+        self._preparer(classe, annee_scolaire_str, version_classe(classe), forcer=True)
+
+    def _preparer(self, classe: str, annee_scolaire_str: str, version_disque: str, forcer: bool = False) -> None:
+        cle = (classe, annee_scolaire_str)
+        with self._verrou:
+            if cle in self.en_preparation or (not forcer and self.echecs.get(cle, ("",))[0] == version_disque):
+                return
+            # Réservation : une seule préparation par classe à la fois
+            self.en_preparation[cle] = ("", DONNEES_VIDES)
+        self._executeur.submit(self._basculer, classe, annee_scolaire_str, version_disque, forcer)
+
+    def _basculer(self, classe: str, annee_scolaire_str: str, version_disque: str, forcer: bool) -> None:
+        cle = (classe, annee_scolaire_str)
+        debut = time.perf_counter()
+        entree = {"classe": classe, "annee": annee_scolaire_str, "date": datetime.now()}
+        try:
+            if forcer:
+                with self._verrou:
+                    self._rechargements += 1
+                    version = f"{version_disque}+{self._rechargements}"
+                if feuille_classe(classe) is not None:
+                    client_sheets().oublier(feuille_classe(classe))
                 try:
-                    debut = datetime.fromisoformat(start_str)
-                    fin = datetime.fromisoformat(end_str)
-                    vacances.append((debut, fin))
-                except ValueError:
+                    os.remove(chemin_instantane(classe, annee_scolaire_str))
+                except OSError:
                     pass
+                nouvelles = compiler_instantane(classe, annee_scolaire_str)
+            else:
+                version = version_disque
+                nouvelles, erreur = _charger_donnees_version(classe, annee_scolaire_str, version)
+                if erreur is not None:
+                    _charger_donnees_version.clear(classe, annee_scolaire_str, version)
+                    raise ValueError(erreur)
+
+            servie = self.servies.get(cle)
+            if servie is None:
+                raise LookupError("classe évincée pendant la préparation")
+            ancienne, anciennes = servie
+            diff = differ_donnees(anciennes, nouvelles)
+            if diff_vide(diff):
+                # Même contenu (fichier réenregistré...) : tout ce qui est dérivé reste valide
+                self.alias[cle] = (version_disque, ancienne)
+            else:
+                self.en_preparation[cle] = (version, nouvelles)
+                self.transitions[cle + (version,)] = (ancienne, diff["groupes_affectes"])
+                try:
+                    # Structures dérivées construites avant la bascule : le premier
+                    # visiteur de la nouvelle version ne paie rien
+                    _index_version(classe, annee_scolaire_str, version)
+                    _grille_version(classe, annee_scolaire_str, version)
+                finally:
+                    self.transitions.pop(cle + (version,), None)
+                with self._verrou:
+                    if cle in self.servies:
+                        self.servies[cle] = (version, nouvelles)
+                    # Alias de l'ancienne version périmé avec elle
+                    self.alias.pop(cle, None)
+            self.echecs.pop(cle, None)
+            entree.update(bascule=not diff_vide(diff), diff=diff)
+        except Exception as e:
+            # Échec retenu tant que la classe est servie, pour ne pas relire en boucle
+            if cle in self.servies:
+                self.echecs[cle] = (version_disque, str(e))
+            entree["erreur"] = str(e)
+        finally:
+            with self._verrou:
+                self.en_preparation.pop(cle, None)
+            entree["duree_ms"] = (time.perf_counter() - debut) * 1000
+            self.journal.appendleft(entree)
+
+@st.cache_resource
+def versions() -> GestionnaireVersions:
+    return GestionnaireVersions(CONFIG["classes_en_memoire"])
+
+def version_servie(classe: str, annee_scolaire_str: str) -> str:
+    return versions().version(classe, annee_scolaire_str)
+
+# ============================================================================
+# INDEX DES COLLES
+# ============================================================================
+
+class IndexColloscope:
+    def __init__(self, lignes: Dict[Tuple[str, int], List[List[str]]],
+                 cles_inconnues: Dict[Tuple[str, int], List[str]],
+                 nb_semaines: Dict[str, int],
+                 details: Optional[Dict[str, List[str]]] = None,
+                 par_professeur: Optional[Dict[str, Dict[int, List[Tuple[str, str]]]]] = None,
+                 par_creneau: Optional[Dict[Tuple[int, str, str], Dict[str, List[Tuple[str, str]]]]] = None):
+        self.lignes = lignes
+        self.cles_inconnues = cles_inconnues
+        self.nb_semaines = nb_semaines
+        self.semaine_max = max(nb_semaines.values(), default=0)
+        self._tableaux: Dict[Tuple[str, int], pd.DataFrame] = {}
+
+        # Index inversés : professeur -> semaine -> (groupe, clé) ;
+        # (semaine, jour, heure) -> salle -> (groupe, clé)
+        self.details = details or {}
+        self.par_professeur = par_professeur or {}
+        self.par_creneau = par_creneau or {}
+        self.professeurs = sorted(self.par_professeur)
+        self.salles = sorted({ligne[3] for ligne in self.details.values() if ligne[3]})
+        self.creneaux = sorted(
+            {creneau(ligne[1], ligne[2]) for ligne in self.details.values() if ligne[1] and ligne[2]},
+            key=lambda jour_heure: (
+                JOURS_SEMAINE.get(jour_heure[0], 7), lire_heure(jour_heure[1]) or (24, 0), jour_heure
+            ),
+        )
+
+    def colles_professeur(self, professeur: str, semaine: int) -> List[Tuple[str, str]]:
+        return self.par_professeur.get(professeur, {}).get(semaine, [])
+
+    def occupants(self, semaine: int, jour: str, heure: str) -> Dict[str, List[Tuple[str, str]]]:
+        return self.par_creneau.get((semaine,) + creneau(jour, heure), {})
 
-        annee_debut_num = int(annee_scolaire_str.split('-')[0])
-        annee_fin_num = int(annee_scolaire_str.split('-')[1])
-        periode_debut = datetime(annee_debut_num, 9, 1)
-        periode_fin = datetime(annee_fin_num, 8, 31)
+    def salles_libres(self, semaine: int, jour: str, heure: str) -> List[str]:
+        # Ne dépend que du nombre de salles, pas de la taille de la classe
+        occupees = self.occupants(semaine, jour, heure)
+        return [salle for salle in self.salles if salle not in occupees]
 
-        vacances = [
-            (start, end) for start, end in vacances
-            if to_naive(end) >= periode_debut and to_naive(start) <= periode_fin
+    @instrumenter("creer_tableau")
+    def tableau(self, groupe: str, semaine: int) -> Optional[pd.DataFrame]:
+        if (groupe, semaine) not in self._tableaux and self.lignes.get((groupe, semaine)):
+            metriques().compter_manque("creer_tableau")
+        return self.preparer_tableau(groupe, semaine)
+
+    def preparer_tableau(self, groupe: str, semaine: int) -> Optional[pd.DataFrame]:
+        # Sans mesure : sert aussi à construire d'avance les semaines voisines,
+        # qui ne doivent pas fausser les statistiques de creer_tableau
+        lignes = self.lignes.get((groupe, semaine))
+        if not lignes:
+            return None
+        df = self._tableaux.get((groupe, semaine))
+        if df is None:
+            df = pd.DataFrame(lignes, columns=COLONNES_TABLEAU)
+            df.index = ['' for _ in range(len(df))]
+            self._tableaux[(groupe, semaine)] = df
+        return df
+
+    def reprendre_tableaux(self, precedent: "IndexColloscope", groupes_affectes: set) -> None:
+        self._tableaux.update({
+            (groupe, semaine): df for (groupe, semaine), df in precedent._tableaux.items()
+            if groupe not in groupes_affectes
+        })
+
+    def avertissements(self) -> List[str]:
+        return [
+            f"Clé '{cle}' introuvable dans la légende ({groupe}, semaine {semaine})."
+            for (groupe, semaine), cles in self.cles_inconnues.items()
+            for cle in cles
         ]
-    except Exception as e:
-        st.warning(f"⚠️ Impossible de récupérer les vacances : {e}")
-        vacances = []
 
-    return vacances
+def creneau(jour: str, heure: str) -> Tuple[str, str]:
+    # Même normalisation que l'analyse : « Mardi » et « mardi » sont un même créneau
+    return jour.strip().lower(), heure.strip()
+
+def construire_index(dictionnaire_donnees: Dict, dictionnaire_legende: Dict) -> IndexColloscope:
+    # Chaque clé de la légende n'est résolue qu'une fois, puis partagée
+    cles_resolues = {}
+    for cle, valeurs in dictionnaire_legende.items():
+        elements = aplatir_liste(valeurs)
+        elements.append(determiner_matiere(cle))
+        cles_resolues[cle] = elements
+
+    lignes: Dict[Tuple[str, int], List[List[str]]] = {}
+    cles_inconnues: Dict[Tuple[str, int], List[str]] = {}
+    nb_semaines: Dict[str, int] = {}
+    par_professeur: Dict[str, Dict[int, List[Tuple[str, str]]]] = defaultdict(lambda: defaultdict(list))
+    par_creneau: Dict[Tuple[int, str, str], Dict[str, List[Tuple[str, str]]]] = defaultdict(lambda: defaultdict(list))
+    for groupe, donnees_groupe in dictionnaire_donnees.items():
+        nb_semaines[groupe] = len(donnees_groupe)
+        for semaine, cle_semaine in enumerate(donnees_groupe, start=1):
+            lignes_semaine = []
+            for cle in cle_semaine.split():
+                if cle in cles_resolues:
+                    ligne = cles_resolues[cle]
+                    lignes_semaine.append(ligne)
+                    professeur, jour, heure, salle = champs_legende(ligne)
+                    if professeur:
+                        par_professeur[professeur][semaine].append((groupe, cle))
+                    if salle and jour and heure:
+                        par_creneau[(semaine,) + creneau(jour, heure)][salle].append((groupe, cle))
+                else:
+                    cles_inconnues.setdefault((groupe, semaine), []).append(cle)
+            lignes[(groupe, semaine)] = lignes_semaine
+
+    # Figés en dict simples : une recherche absente ne crée pas d'entrée
+    return IndexColloscope(
+        lignes, cles_inconnues, nb_semaines,
+        {cle: champs_legende(ligne) for cle, ligne in cles_resolues.items()},
+        {professeur: dict(semaines) for professeur, semaines in par_professeur.items()},
+        {cle: dict(salles) for cle, salles in par_creneau.items()},
+    )
+
+def obtenir_index(classe: str, annee_scolaire_str: str) -> IndexColloscope:
+    return _index_version(classe, annee_scolaire_str, version_servie(classe, annee_scolaire_str))
+
+@st.cache_resource(max_entries=CONFIG["classes_en_memoire"])
+def _index_version(classe: str, annee_scolaire_str: str, version: str) -> IndexColloscope:
+    dictionnaire_donnees, dictionnaire_legende, _ = donnees_version(classe, annee_scolaire_str, version)
+    index = construire_index(dictionnaire_donnees, dictionnaire_legende)
+    transition = versions().transitions.get((classe, annee_scolaire_str, version))
+    if transition is not None:
+        # Bascule en préparation : les tableaux des groupes inchangés sont repris tels quels
+        ancienne, groupes_affectes = transition
+        index.reprendre_tableaux(_index_version(classe, annee_scolaire_str, ancienne), set(groupes_affectes))
+    return index
 
 # ============================================================================
-# PARAMÈTRES
+# VUE D'ENSEMBLE (TOUS GROUPES / TOUTES SEMAINES)
 # ============================================================================
 
-CONFIG_FILE = "config.json"
+def construire_grille(dictionnaire_donnees: Dict, dictionnaire_legende: Dict) -> pd.DataFrame:
+    # Une ligne par colle : matrice groupes × semaines de clés, éclatée puis
+    # jointe à la légende en un seul merge
+    matrice = pd.DataFrame.from_dict(dict(dictionnaire_donnees), orient="index")
+    if matrice.empty:
+        return pd.DataFrame(columns=["Groupe", "Semaine", "Clé"] + COLONNES_TABLEAU)
+    matrice.columns = range(1, matrice.shape[1] + 1)
+    colles = (
+        matrice.rename_axis(index="Groupe", columns="Semaine")
+        .stack()
+        .str.split()
+        .explode()
+        .dropna()
+        .rename("Clé")
+        .reset_index()
+    )
 
-def enregistrer_parametres(groupe: str, semaine: str, classe: str) -> None:
-    config = {"groupe": groupe, "semaine": semaine, "classe": classe}
-    try:
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f)
-    except Exception as e:
-        st.warning(f"⚠️ Impossible de sauvegarder la config : {e}")
+    legende = pd.DataFrame(
+        [[cle] + champs_legende(aplatir_liste(valeurs)) for cle, valeurs in dictionnaire_legende.items()],
+        columns=["Clé"] + COLONNES_TABLEAU[:4],
+    )
+    motif_matieres = "^(" + "|".join(re.escape(prefixe) for prefixe in PREFIXES_MATIERES) + ")"
+    legende["Matière"] = (
+        legende["Clé"].str.extract(motif_matieres)[0].map(MATIERES_MAP).fillna("Non spécifié")
+    )
 
-def charger_parametres() -> Tuple[str, str, str]:
-    defaults = ("G1", "1", "1")
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-                return (
-                    config.get("groupe", defaults[0]),
-                    config.get("semaine", defaults[1]),
-                    config.get("classe", defaults[2])
-                )
-        except Exception:
-            pass
-    return defaults
+    grille = colles.merge(legende, on="Clé", how="left")
+    grille["Professeur"] = grille["Professeur"].fillna("❓ Clé inconnue")
+    return grille.fillna("")
+
+def obtenir_grille(classe: str, annee_scolaire_str: str) -> pd.DataFrame:
+    return _grille_version(classe, annee_scolaire_str, version_servie(classe, annee_scolaire_str))
+
+@st.cache_resource(max_entries=CONFIG["classes_en_memoire"])
+def _grille_version(classe: str, annee_scolaire_str: str, version: str) -> pd.DataFrame:
+    dictionnaire_donnees, dictionnaire_legende, _ = donnees_version(classe, annee_scolaire_str, version)
+    return construire_grille(dictionnaire_donnees, dictionnaire_legende)
 
 # ============================================================================
-# LOGIQUE MÉTIER
+# ANALYSE DU COLLOSCOPE
 # ============================================================================
 
-def semaine_actuelle(dates_semaines: List[Optional[datetime]], date_actuelle: Optional[datetime] = None) -> int:
-    if date_actuelle is None:
-        date_actuelle = datetime.now()
-
-    current_weekday = date_actuelle.weekday()
-    lundi_actuel = (date_actuelle - timedelta(days=current_weekday)).replace(
-        hour=0, minute=0, second=0, microsecond=0
+class RapportAnalyse:
+    def __init__(self, collisions: List[Dict], charge: Dict[str, Dict[int, int]], rotations: List[Dict]):
+        self.collisions = collisions
+        self.charge = charge
+        self.rotations = rotations
+
+    def alertes_rotation(self) -> List[Dict]:
+        return [rotation for rotation in self.rotations if rotation["alerte"]]
+
+def analyser_colloscope(dictionnaire_donnees: Dict, dictionnaire_legende: Dict) -> RapportAnalyse:
+    details = {cle: champs_legende(aplatir_liste(valeurs)) for cle, valeurs in dictionnaire_legende.items()}
+
+    # Un seul passage sur le colloscope : chaque index regroupe les colles
+    # qui ne devraient jamais partager une même clé
+    par_cle: Dict[Tuple, List[str]] = defaultdict(list)
+    par_professeur: Dict[Tuple, Dict[str, str]] = defaultdict(dict)
+    par_salle: Dict[Tuple, Dict[str, str]] = defaultdict(dict)
+    par_groupe: Dict[Tuple, List[str]] = defaultdict(list)
+    charge: Dict[str, Dict[int, set]] = defaultdict(lambda: defaultdict(set))
+    passages: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+
+    for groupe, donnees_groupe in dictionnaire_donnees.items():
+        for semaine, cle_semaine in enumerate(donnees_groupe, start=1):
+            for cle in cle_semaine.split():
+                if cle not in details:
+                    continue
+                professeur, jour, heure, salle = details[cle]
+                moment = creneau(jour, heure)
+                par_cle[(semaine, cle)].append(groupe)
+                par_professeur[(semaine, professeur) + moment][cle] = groupe
+                if salle:
+                    par_salle[(semaine, salle) + moment][professeur] = cle
+                par_groupe[(semaine, groupe) + moment].append(cle)
+                charge[professeur][semaine].add(cle)
+                passages[(groupe, determiner_matiere(cle))].append(semaine)
+
+    collisions = []
+    for (semaine, cle), groupes in par_cle.items():
+        # Séances collectives déclarées dans la configuration : partagées par construction
+        if len(groupes) > 1 and not cle_collective(cle):
+            collisions.append({"type": "Clé attribuée plusieurs fois", "semaine": semaine,
+                               "detail": cle, "groupes": ", ".join(groupes)})
+    for (semaine, professeur, jour, heure), cles in par_professeur.items():
+        if len(cles) > 1:
+            collisions.append({"type": "Professeur sur deux colles", "semaine": semaine,
+                               "detail": f"{professeur} {jour} {heure} ({', '.join(cles)})",
+                               "groupes": ", ".join(dict.fromkeys(cles.values()))})
+    for (semaine, salle, jour, heure), professeurs in par_salle.items():
+        if len(professeurs) > 1:
+            collisions.append({"type": "Salle occupée deux fois", "semaine": semaine,
+                               "detail": f"{salle} {jour} {heure} ({', '.join(professeurs)})",
+                               "groupes": ", ".join(professeurs.values())})
+    for (semaine, groupe, jour, heure), cles in par_groupe.items():
+        if len(cles) > 1:
+            collisions.append({"type": "Groupe sur deux colles", "semaine": semaine,
+                               "detail": f"{jour} {heure} ({', '.join(cles)})", "groupes": groupe})
+    collisions.sort(key=lambda collision: (collision["semaine"], collision["type"]))
+
+    # Écarts entre deux passages consécutifs d'un groupe dans une matière
+    ecarts: Dict[Tuple[str, str], List[int]] = {
+        cle: [b - a for a, b in zip(sorted(semaines), sorted(semaines)[1:])] for cle, semaines in passages.items()
+    }
+    ecarts_par_matiere: Dict[str, List[int]] = defaultdict(list)
+    for (_, matiere), valeurs in ecarts.items():
+        ecarts_par_matiere[matiere].extend(valeurs)
+    medianes = {matiere: sorted(valeurs)[len(valeurs) // 2] for matiere, valeurs in ecarts_par_matiere.items() if valeurs}
+
+    rotations = []
+    for (groupe, matiere), semaines in passages.items():
+        ecart_max = max(ecarts[(groupe, matiere)], default=0)
+        rotations.append({
+            "groupe": groupe,
+            "matiere": matiere,
+            "passages": len(semaines),
+            "ecart_max": ecart_max,
+            "ecart_median_matiere": medianes.get(matiere, 0),
+            "alerte": ecart_max > CONFIG["facteur_ecart_rotation"] * medianes.get(matiere, ecart_max),
+        })
+
+    return RapportAnalyse(
+        collisions,
+        {prof: {semaine: len(cles) for semaine, cles in semaines.items()} for prof, semaines in charge.items()},
+        rotations,
     )
 
-    for i, date_semaine_excel in enumerate(dates_semaines):
-        if date_semaine_excel is None:
-            continue
-        lundi_excel = date_semaine_excel.replace(hour=0, minute=0, second=0, microsecond=0)
-        if lundi_excel >= lundi_actuel:
-            return i + 1
+def obtenir_analyse(classe: str, annee_scolaire_str: str) -> RapportAnalyse:
+    return _analyse_version(classe, annee_scolaire_str, version_servie(classe, annee_scolaire_str))
 
-    return len(dates_semaines) if dates_semaines else 1
+@st.cache_resource(max_entries=CONFIG["classes_en_memoire"])
+def _analyse_version(classe: str, annee_scolaire_str: str, version: str) -> RapportAnalyse:
+    dictionnaire_donnees, dictionnaire_legende, _ = donnees_version(classe, annee_scolaire_str, version)
+    return analyser_colloscope(dictionnaire_donnees, dictionnaire_legende)
 
-def creer_tableau(groupe: str, semaine: str, dictionnaire_donnees: Dict, dictionnaire_legende: Dict) -> List:
-    tableau = []
-    try:
-        semaine_int = int(semaine)
-        if groupe not in dictionnaire_donnees:
-            st.error(f"❌ Le groupe '{groupe}' n'existe pas dans les données.")
-            return tableau
+# ============================================================================
+# VACANCES SCOLAIRES
+# ============================================================================
 
-        donnees_groupe = dictionnaire_donnees[groupe]
-        if not (1 <= semaine_int <= len(donnees_groupe)):
-            st.error(f"❌ La semaine {semaine_int} n'est pas valide pour le groupe '{groupe}'.")
-            return tableau
+def telecharger_vacances(session: "requests.Session", zone: str, annee_scolaire_str: str) -> List[Tuple]:
+    params = {
+        "dataset": "fr-en-calendrier-scolaire",
+        "rows": 500,
+        "refine.zone": f"Zone {zone}",
+        "refine.annee_scolaire": annee_scolaire_str,
+    }
+    response = session.get(CONFIG["vacances_api_url"], params=params, timeout=10)
+    response.raise_for_status()
+    data = response.json()
 
-        cle_semaine = donnees_groupe[semaine_int - 1]
+    vacances = []
+    for record in data.get("records", []):
+        fields = record.get("fields", {})
+        start_str = fields.get("start_date")
+        end_str = fields.get("end_date")
+        if start_str and end_str:
+            try:
+                debut = datetime.fromisoformat(start_str)
+                fin = datetime.fromisoformat(end_str)
+                vacances.append((debut, fin))
+            except ValueError:
+                pass
+
+    annee_debut_num = int(annee_scolaire_str.split('-')[0])
+    annee_fin_num = int(annee_scolaire_str.split('-')[1])
+    periode_debut = datetime(annee_debut_num, 9, 1)
+    periode_fin = datetime(annee_fin_num, 8, 31)
+
+    return [
+        (start, end) for start, end in vacances
+        if to_naive(end) >= periode_debut and to_naive(start) <= periode_fin
+    ]
+
+# Vacances par (zone, année scolaire), persistées sur disque et rafraîchies
+# en arrière-plan : une page ne bloque jamais sur l'API.
+class MagasinVacances:
+    def __init__(self, dossier: str):
+        self.dossier = dossier
+        self.entrees: Dict[Tuple[str, str], Dict] = {}
+        self.erreurs: Dict[Tuple[str, str], str] = {}
+        self._tentatives: Dict[Tuple[str, str], float] = {}
+        self._en_cours: set = set()
+        self._verrou = threading.Lock()
+        # Pool borné partagé par toutes les zones et années à rafraîchir
+        self._executeur = ThreadPoolExecutor(max_workers=CONFIG["vacances_fils"], thread_name_prefix="vacances")
+
+    def _chemin(self, zone: str, annee_scolaire_str: str) -> str:
+        return os.path.join(self.dossier, f"vacances_{zone}_{annee_scolaire_str}.json")
+
+    def lire(self, zone: str, annee_scolaire_str: str) -> Optional[Dict]:
+        cle = (zone, annee_scolaire_str)
+        if cle not in self.entrees:
+            try:
+                with open(self._chemin(zone, annee_scolaire_str), 'r') as f:
+                    brut = json.load(f)
+                self.entrees[cle] = {
+                    "maj": brut["maj"],
+                    "vacances": [(datetime.fromisoformat(debut), datetime.fromisoformat(fin)) for debut, fin in brut["vacances"]],
+                }
+            except (OSError, ValueError, KeyError):
+                return None
+        return self.entrees[cle]
+
+    def ecrire(self, zone: str, annee_scolaire_str: str, vacances: List[Tuple]) -> None:
+        entree = {"maj": time.time(), "vacances": vacances}
+        self.entrees[(zone, annee_scolaire_str)] = entree
+        chemin = self._chemin(zone, annee_scolaire_str)
+        # Fichier temporaire propre au processus : deux workers qui rafraîchissent
+        # la même zone ne tronquent pas le fichier l'un de l'autre
+        chemin_tmp = f"{chemin}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.dossier, exist_ok=True)
+            with open(chemin_tmp, 'w') as f:
+                json.dump({
+                    "maj": entree["maj"],
+                    "vacances": [[debut.isoformat(), fin.isoformat()] for debut, fin in vacances],
+                }, f)
+            os.replace(chemin_tmp, chemin)
+        except OSError:
+            pass
+        finally:
+            if os.path.exists(chemin_tmp):
+                os.remove(chemin_tmp)
+
+    def rafraichir_en_arriere_plan(self, session: "requests.Session", zone: str, annee_scolaire_str: str) -> None:
+        cle = (zone, annee_scolaire_str)
+        with self._verrou:
+            if cle in self._en_cours:
+                return
+            if time.time() - self._tentatives.get(cle, 0) < CONFIG["vacances_delai_nouvel_essai_s"]:
+                return
+            self._en_cours.add(cle)
+            self._tentatives[cle] = time.time()
+        self._executeur.submit(self._rafraichir, session, zone, annee_scolaire_str)
+
+    def _rafraichir(self, session: "requests.Session", zone: str, annee_scolaire_str: str) -> None:
+        cle = (zone, annee_scolaire_str)
+        try:
+            self.ecrire(zone, annee_scolaire_str, telecharger_vacances(session, zone, annee_scolaire_str))
+            self.erreurs.pop(cle, None)
+        except Exception as e:
+            self.erreurs[cle] = str(e)
+        finally:
+            with self._verrou:
+                self._en_cours.discard(cle)
+
+@st.cache_resource
+def session_http() -> "requests.Session":
+    # Connexions réutilisées ; les nouvelles tentatives ne tournent que dans
+    # les threads de rafraîchissement
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    adaptateur = HTTPAdapter(max_retries=Retry(
+        total=CONFIG["vacances_tentatives"],
+        backoff_factor=1,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+    ))
+    session.mount("http://", adaptateur)
+    session.mount("https://", adaptateur)
+    return session
+
+@st.cache_resource
+def magasin_vacances() -> MagasinVacances:
+    return MagasinVacances(chemin_ressource(CONFIG["dossier_cache"]))
+
+@instrumenter("obtenir_vacances")
+def obtenir_vacances(zone: str = "C", annee_scolaire_str: Optional[str] = None) -> List[Tuple]:
+    if annee_scolaire_str is None:
+        annee_scolaire_str = detecter_annee_scolaire_actuelle()
 
-        if not cle_semaine:
-            return tableau
+    magasin = magasin_vacances()
+    entree = magasin.lire(zone, annee_scolaire_str)
+    # Stale-while-revalidate : on sert la dernière version connue
+    if entree is None or time.time() - entree["maj"] > CONFIG["vacances_fraicheur_s"]:
+        metriques().compter_manque("obtenir_vacances")
+        magasin.rafraichir_en_arriere_plan(session_http(), zone, annee_scolaire_str)
+    return entree["vacances"] if entree else []
+
+def rafraichir_vacances(zone: str, annee_scolaire_str: str) -> List[Tuple]:
+    vacances = telecharger_vacances(session_http(), zone, annee_scolaire_str)
+    magasin_vacances().ecrire(zone, annee_scolaire_str, vacances)
+    return vacances
 
-        # ✅ Supporte plusieurs colles séparées par des espaces (ex: "M10 SI7")
-        cles = cle_semaine.split()
+def cles_vacances(annee_scolaire_str: str) -> List[Tuple[str, str]]:
+    zones = dict.fromkeys(CONFIG["zones_vacances"] + (CONFIG["zone_vacances"],))
+    return [
+        (zone, annee)
+        for annee in (annee_scolaire_str, annee_scolaire_suivante(annee_scolaire_str))
+        for zone in zones
+    ]
+
+def prechauffer_vacances(annee_scolaire_str: str) -> None:
+    # Non bloquant : chaque entrée périmée part dans le pool du magasin
+    for zone, annee in cles_vacances(annee_scolaire_str):
+        obtenir_vacances(zone, annee)
+
+def rafraichir_toutes_vacances(annee_scolaire_str: str) -> Dict[Tuple[str, str], object]:
+    # Bloquant, toutes zones et deux années en parallèle : liste de périodes ou exception par clé
+    cles = cles_vacances(annee_scolaire_str)
+    with ThreadPoolExecutor(max_workers=CONFIG["vacances_fils"]) as executeur:
+        futurs = {cle: executeur.submit(rafraichir_vacances, *cle) for cle in cles}
+    resultats: Dict[Tuple[str, str], object] = {}
+    for cle, futur in futurs.items():
+        try:
+            resultats[cle] = futur.result()
+        except Exception as e:
+            resultats[cle] = e
+    return resultats
 
-        for cle in cles:
-            if cle not in dictionnaire_legende:
-                st.warning(f"⚠️ Clé '{cle}' introuvable dans la légende.")
-                continue
+# ============================================================================
+# PARAMÈTRES
+# ============================================================================
 
-            elements = aplatir_liste(dictionnaire_legende[cle])
-            matiere = determiner_matiere(cle)
-            elements.append(matiere)
-            tableau.append(elements)
+# Préférences propres à chaque utilisateur, portées par l'URL (?classe=1&groupe=G3&semaine=5) :
+# elles survivent au rechargement, se mettent en favori et ne touchent jamais le disque.
+PARAMETRES_DEFAUT = {"groupe": "G1", "semaine": "1", "classe": "1"}
 
-    except ValueError:
-        st.error("❌ Veuillez entrer une semaine valide (nombre entier).")
-    except Exception as e:
-        st.error(f"❌ Erreur inattendue lors de la création du tableau : {e}")
+def enregistrer_parametres(groupe: str, semaine: str, classe: str) -> None:
+    for cle, valeur in (("groupe", groupe), ("semaine", semaine), ("classe", classe)):
+        # N'écrire que les changements : chaque écriture est envoyée au navigateur
+        if st.query_params.get(cle) != valeur:
+            st.query_params[cle] = valeur
+
+def charger_parametres() -> Tuple[str, str, str]:
+    # La classe de l'URL n'est retenue que si elle existe : elle sert à charger
+    # des données avant même que le sélecteur ne la vérifie
+    classe = st.query_params.get("classe", PARAMETRES_DEFAUT["classe"])
+    classes = decouvrir_classes()
+    if classe not in classes:
+        classe = classes[0] if classes else PARAMETRES_DEFAUT["classe"]
+    return (
+        st.query_params.get("groupe", PARAMETRES_DEFAUT["groupe"]),
+        st.query_params.get("semaine", PARAMETRES_DEFAUT["semaine"]),
+        classe,
+    )
+
+# ============================================================================
+# LOGIQUE MÉTIER
+# ============================================================================
 
-    return tableau
+# Périodes de vacances fusionnées et triées : période d'un jour trouvée par dichotomie
+class IntervallesVacances:
+    def __init__(self, vacances: Optional[List[Tuple]] = None):
+        self.debuts: List[date] = []
+        self.fins: List[date] = []
+        for debut, fin in sorted((to_naive(debut).date(), to_naive(fin).date()) for debut, fin in vacances or []):
+            if self.fins and debut <= self.fins[-1] + timedelta(days=1):
+                self.fins[-1] = max(self.fins[-1], fin)
+            else:
+                self.debuts.append(debut)
+                self.fins.append(fin)
+
+    def _periode(self, jour: date) -> int:
+        position = bisect_right(self.debuts, jour) - 1
+        return position if position >= 0 and jour <= self.fins[position] else -1
+
+    def couvre_semaine(self, lundi: date) -> bool:
+        # Semaine de vacances : du lundi au vendredi dans une même période
+        position = self._periode(lundi)
+        return position >= 0 and lundi + timedelta(days=4) <= self.fins[position]
+
+class IndexSemaines:
+    def __init__(self, dates_semaines: List[Optional[datetime]], vacances: Optional[List[Tuple]] = None):
+        self.vacances = IntervallesVacances(vacances)
+
+        # Dates absentes de l'en-tête : déduites d'une date réelle de l'en-tête en sautant
+        # les semaines de vacances. Avant la première date réelle, la semaine reste non datée.
+        self.lundis_semaines: List[Optional[date]] = []
+        precedent = None
+        for d in dates_semaines:
+            if d is not None:
+                lundi = self.lundi(d.date())
+            elif precedent is not None:
+                lundi = precedent + timedelta(days=7)
+                while self.vacances.couvre_semaine(lundi):
+                    lundi += timedelta(days=7)
+            else:
+                lundi = None
+            self.lundis_semaines.append(lundi)
+            precedent = lundi if lundi is not None else precedent
 
-def changer_semaine(sens: int) -> None:
+        paires = sorted(
+            (lundi, numero)
+            for numero, lundi in enumerate(self.lundis_semaines, start=1) if lundi is not None
+        )
+        self.lundis = [lundi for lundi, _ in paires]
+        self.numeros = [numero for _, numero in paires]
+        self.nb_semaines = len(dates_semaines)
+
+        self._memo: Dict[date, Tuple[int, bool]] = {}
+
+    @staticmethod
+    def lundi(jour: date) -> date:
+        return jour - timedelta(days=jour.weekday())
+
+    def semaine_pour(self, jour: date) -> Tuple[int, bool]:
+        # Renvoie (numéro de semaine du colloscope, semaine de vacances ?) ;
+        # pendant les vacances, c'est la semaine de la reprise
+        resultat = self._memo.get(jour)
+        if resultat is None:
+            lundi = self.lundi(jour)
+            position = bisect_left(self.lundis, lundi)
+            if position < len(self.lundis):
+                numero = self.numeros[position]
+            else:
+                # Colloscope sans aucune date : semaine 1, comme avant l'index
+                numero = self.nb_semaines if self.lundis else 1
+            resultat = (numero, self.vacances.couvre_semaine(lundi))
+            self._memo[jour] = resultat
+        return resultat
+
+    def lundi_semaine(self, numero: int) -> Optional[date]:
+        return self.lundis_semaines[numero - 1] if 1 <= numero <= len(self.lundis_semaines) else None
+
+    def apres_vacances(self, numero: int) -> bool:
+        lundi = self.lundi_semaine(numero)
+        return lundi is not None and self.vacances.couvre_semaine(lundi - timedelta(days=7))
+
+    def libelle(self, semaine: str) -> str:
+        lundi = self.lundi_semaine(int(semaine))
+        if lundi is None:
+            return semaine
+        return f"{semaine} — {lundi.strftime('%d/%m')}" + (" 🏖️ reprise" if self.apres_vacances(int(semaine)) else "")
+
+def obtenir_index_semaines(classe: str, annee_scolaire_str: str) -> IndexSemaines:
+    # Année suivante incluse : les semaines de fin d'année restent couvertes au changement d'année
+    zone = CONFIG["zone_vacances"]
+    vacances = obtenir_vacances(zone, annee_scolaire_str) + obtenir_vacances(zone, annee_scolaire_suivante(annee_scolaire_str))
+    return _index_semaines_version(classe, annee_scolaire_str, version_servie(classe, annee_scolaire_str), tuple(vacances))
+
+@st.cache_resource(max_entries=CONFIG["classes_en_memoire"])
+def _index_semaines_version(classe: str, annee_scolaire_str: str, version: str, vacances: Tuple) -> IndexSemaines:
+    _, _, dates_semaines = donnees_version(classe, annee_scolaire_str, version)
+    # En-tête incomplet : les semaines après la dernière date seront datées par déduction
+    semaine_max = _index_version(classe, annee_scolaire_str, version).semaine_max
+    dates_semaines = list(dates_semaines) + [None] * (semaine_max - len(dates_semaines))
+    return IndexSemaines(dates_semaines, list(vacances))
+
+def changer_semaine(sens: int, semaine_max: int) -> None:
+    # Rappel de bouton : exécuté avant la réexécution, le sélecteur affiche déjà la nouvelle semaine
     try:
         nouvelle_semaine = int(st.session_state.semaine) + sens
-        if 1 <= nouvelle_semaine <= CONFIG["max_weeks"]:
+        if 1 <= nouvelle_semaine <= semaine_max:
             st.session_state.semaine = str(nouvelle_semaine)
+            st.session_state.semaine_select = str(nouvelle_semaine)
     except (ValueError, TypeError):
         pass
+    st.session_state.afficher_colloscope = True
+
+# ============================================================================
+# EXPORT ICALENDAR
+# ============================================================================
+
+JOURS_SEMAINE = {
+    "lundi": 0, "mardi": 1, "mercredi": 2, "jeudi": 3,
+    "vendredi": 4, "samedi": 5, "dimanche": 6,
+}
+
+VTIMEZONE_PARIS = [
+    "BEGIN:VTIMEZONE",
+    "TZID:Europe/Paris",
+    "BEGIN:DAYLIGHT",
+    "TZOFFSETFROM:+0100",
+    "TZOFFSETTO:+0200",
+    "TZNAME:CEST",
+    "DTSTART:19700329T020000",
+    "RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU",
+    "END:DAYLIGHT",
+    "BEGIN:STANDARD",
+    "TZOFFSETFROM:+0200",
+    "TZOFFSETTO:+0100",
+    "TZNAME:CET",
+    "DTSTART:19701025T030000",
+    "RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU",
+    "END:STANDARD",
+    "END:VTIMEZONE",
+]
+
+def lire_heure(heure: str) -> Optional[Tuple[int, int]]:
+    # "17h35", "8h", "14:25"
+    match = re.match(r'^\s*(\d{1,2})\s*[hH:]\s*(\d{2})?', heure)
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2) or 0)
+
+def lire_plage_horaire(heure: str) -> Optional[Tuple[Tuple[int, int], Optional[Tuple[int, int]]]]:
+    # "8h-10h", "14:25 – 15h25" : début et fin ; "17h35" : début seul
+    morceaux = re.split(r'\s*[-–]\s*', heure.strip(), maxsplit=1)
+    debut = lire_heure(morceaux[0])
+    if debut is None:
+        return None
+    fin = lire_heure(morceaux[1]) if len(morceaux) > 1 else None
+    return debut, fin if fin is not None and fin > debut else None
+
+def echapper_ics(texte: str) -> str:
+    return texte.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+def plier_ligne_ics(ligne: str) -> str:
+    # RFC 5545 : lignes de 75 octets maximum, continuées par un espace
+    morceaux, courant = [], ""
+    for caractere in ligne:
+        if len((courant + caractere).encode("utf-8")) > 75:
+            morceaux.append(courant)
+            courant = " "
+        courant += caractere
+    morceaux.append(courant)
+    return "\r\n".join(morceaux) + "\r\n"
+
+def iter_ics(classe: str, groupes: List[str], index: IndexColloscope,
+             lundis_semaines: Tuple[Optional[date], ...], horodatage: datetime) -> Iterator[str]:
+    nom = f"Colloscope {libelle_classe(classe)}" + (f" {groupes[0]}" if len(groupes) == 1 else "")
+    for ligne in ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Colloscope TSI//FR", "CALSCALE:GREGORIAN",
+                  f"X-WR-CALNAME:{echapper_ics(nom)}", "X-WR-TIMEZONE:Europe/Paris"] + VTIMEZONE_PARIS:
+        yield plier_ligne_ics(ligne)
+
+    dtstamp = horodatage.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    duree = timedelta(minutes=CONFIG["duree_colle_minutes"])
+    for groupe in groupes:
+        for semaine in range(1, index.nb_semaines.get(groupe, 0) + 1):
+            lundi_semaine = lundis_semaines[semaine - 1] if semaine <= len(lundis_semaines) else None
+            if lundi_semaine is None:
+                continue
+            lundi = datetime(lundi_semaine.year, lundi_semaine.month, lundi_semaine.day)
+            for numero, (professeur, jour, heure, salle, matiere) in enumerate(index.lignes.get((groupe, semaine), [])):
+                decalage = JOURS_SEMAINE.get(jour.strip().lower())
+                plage = lire_plage_horaire(heure)
+                if decalage is None or plage is None:
+                    continue
+                horaire, horaire_fin = plage
+                debut = lundi + timedelta(days=decalage, hours=horaire[0], minutes=horaire[1])
+                # Durée fixe seulement quand la légende ne donne pas l'heure de fin
+                fin = (lundi + timedelta(days=decalage, hours=horaire_fin[0], minutes=horaire_fin[1])
+                       if horaire_fin is not None else debut + duree)
+                for ligne in [
+                    "BEGIN:VEVENT",
+                    f"UID:{libelle_classe(classe).lower()}-{groupe}-s{semaine}-{numero}@colloscope",
+                    f"DTSTAMP:{dtstamp}",
+                    f"DTSTART;TZID=Europe/Paris:{debut.strftime('%Y%m%dT%H%M%S')}",
+                    f"DTEND;TZID=Europe/Paris:{fin.strftime('%Y%m%dT%H%M%S')}",
+                    f"SUMMARY:{echapper_ics(f'Colle {matiere} ({professeur})')}",
+                    f"LOCATION:{echapper_ics(salle)}",
+                    f"DESCRIPTION:{echapper_ics(f'Groupe {groupe} - semaine {semaine}')}",
+                    "END:VEVENT",
+                ]:
+                    yield plier_ligne_ics(ligne)
+
+    yield plier_ligne_ics("END:VCALENDAR")
+
+def calendrier_disponible(classe: str, annee_scolaire_str: str) -> bool:
+    # Sans aucune date dans l'en-tête, un calendrier serait vide : il n'est pas proposé
+    return bool(obtenir_index_semaines(classe, annee_scolaire_str).lundis)
+
+def generer_ics(classe: str, annee_scolaire_str: str, groupe: Optional[str] = None) -> str:
+    # Semaines datées comme dans l'application : dates déduites autour des vacances comprises
+    index_semaines = obtenir_index_semaines(classe, annee_scolaire_str)
+    if not index_semaines.lundis:
+        raise LookupError(f"Le colloscope de la classe {libelle_classe(classe)} n'est pas daté : aucun calendrier à exporter.")
+    return _generer_ics_version(
+        classe, annee_scolaire_str, version_servie(classe, annee_scolaire_str), groupe, tuple(index_semaines.lundis_semaines)
+    )
+
+@st.cache_resource(max_entries=CONFIG["calendriers_en_memoire"])
+def _generer_ics_version(classe: str, annee_scolaire_str: str, version: str, groupe: Optional[str],
+                         lundis_semaines: Tuple[Optional[date], ...]) -> str:
+    # Un seul passage sur toutes les semaines ; groupe=None exporte toute la classe
+    index = _index_version(classe, annee_scolaire_str, version)
+    groupes = [groupe] if groupe is not None else list(index.nb_semaines)
+    mtime = max(
+        (os.stat(chemin_ressource(nom)).st_mtime for nom in fichiers_classe(classe) if os.path.exists(chemin_ressource(nom))),
+        default=0,
+    )
+    return "".join(iter_ics(classe, groupes, index, lundis_semaines, datetime.fromtimestamp(mtime, timezone.utc)))
 
 # ============================================================================
 # AFFICHAGE
 # ============================================================================
 
+@st.cache_resource
+def source_logo() -> Optional[str]:
+    # Vignette au double de la taille affichée (écrans haute densité), générée
+    # une fois par processus et servie comme fichier statique (cache navigateur)
+    logo_path = chemin_ressource("logo_prepa.png")
+    if not os.path.exists(logo_path):
+        return None
+    taille = (2 * CONFIG["logo_largeur_px"], 2 * CONFIG["logo_largeur_px"])
+    vignette_path = chemin_ressource(os.path.join("static", "logo_prepa_vignette.png"))
+    try:
+        if not os.path.exists(vignette_path) or os.path.getmtime(vignette_path) < os.path.getmtime(logo_path):
+            with Image.open(logo_path) as image:
+                image.thumbnail(taille)
+                image.save(vignette_path, optimize=True)
+        return "app/static/logo_prepa_vignette.png"
+    except OSError:
+        # Dossier static/ inaccessible : repli sur la vignette en ligne
+        buffer = io.BytesIO()
+        with Image.open(logo_path) as image:
+            image.thumbnail(taille)
+            image.save(buffer, format="PNG", optimize=True)
+        return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+@st.cache_resource(max_entries=4)
+def image_reduite(chemin: str, largeur: int) -> bytes:
+    with Image.open(chemin) as image:
+        image.thumbnail((largeur, 10 * largeur))
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=85, optimize=True)
+    return buffer.getvalue()
+
+@instrumenter("afficher_logo_sidebar")
 def afficher_logo_sidebar() -> None:
-    logo_path = "logo_prepa.png"
-    if os.path.exists(logo_path):
-        try:
-            with open(logo_path, "rb") as img_file:
-                b64_data = base64.b64encode(img_file.read()).decode()
-            html_code = f'''
-            <div style="text-align: center; margin-bottom: 30px;">
-                <a href="https://sites.google.com/site/cpgetsimarcelsembat/" target="_blank">
-                    <img src="data:image/png;base64,{b64_data}" width="120" style="border-radius: 8px;">
-                </a>
-            </div>
-            '''
-            st.sidebar.markdown(html_code, unsafe_allow_html=True)
-        except Exception as e:
-            st.sidebar.warning(f"Logo non disponible : {e}")
+    try:
+        src = source_logo()
+    except Exception as e:
+        st.sidebar.warning(f"Logo non disponible : {e}")
+        return
+    if src:
+        html_code = f'''
+        <div style="text-align: center; margin-bottom: 30px;">
+            <a href="https://sites.google.com/site/cpgetsimarcelsembat/" target="_blank">
+                <img src="{src}" width="{CONFIG['logo_largeur_px']}" style="border-radius: 8px;">
+            </a>
+        </div>
+        '''
+        st.sidebar.markdown(html_code, unsafe_allow_html=True)
 
 def afficher_donnees_colloscope(annee_scolaire_actuelle: str) -> None:
     groupe = st.session_state.groupe
@@ -309,41 +1677,173 @@ def afficher_donnees_colloscope(annee_scolaire_actuelle: str) -> None:
 
     enregistrer_parametres(groupe, semaine, classe)
 
-    # Validation groupe
-    try:
-        numero_groupe = int(groupe[1:])
-        if not (1 <= numero_groupe <= CONFIG["max_groups"]):
-            st.error(f"❌ Le groupe doit être entre G1 et G{CONFIG['max_groups']}.")
-            return
-    except (ValueError, IndexError):
+    if not groupe.strip():
         st.error("❌ Format de groupe invalide (ex: G1, G2...).")
         return
 
     # Validation semaine
     try:
         semaine_int = int(semaine)
-        if not (1 <= semaine_int <= CONFIG["max_weeks"]):
-            st.error(f"❌ La semaine doit être entre 1 et {CONFIG['max_weeks']}.")
-            return
     except ValueError:
         st.error("❌ Semaine invalide.")
         return
 
-    dictionnaire_donnees, dictionnaire_legende, _ = charger_donnees(classe, annee_scolaire_actuelle)
+    dictionnaire_donnees, _, _ = charger_donnees(classe, annee_scolaire_actuelle)
 
     if not dictionnaire_donnees:
-        st.error("❌ Impossible de charger les données du colloscope.")
+        erreur = versions().erreur(classe, annee_scolaire_actuelle)
+        st.error("❌ Impossible de charger les données du colloscope" + (f" : {erreur}" if erreur else "."))
+        return
+
+    # Groupes et semaines valides : ceux présents dans les classeurs de la classe
+    index = obtenir_index(classe, annee_scolaire_actuelle)
+
+    if groupe not in index.nb_semaines:
+        groupes = list(index.nb_semaines)
+        st.error(f"❌ Le groupe '{groupe}' n'existe pas dans les données (groupes : {groupes[0]} à {groupes[-1]}).")
+        return
+    if not (1 <= semaine_int <= index.nb_semaines[groupe]):
+        st.error(f"❌ La semaine {semaine_int} n'est pas valide pour le groupe '{groupe}'.")
         return
 
-    donnees = creer_tableau(groupe, semaine, dictionnaire_donnees, dictionnaire_legende)
+    for cle in index.cles_inconnues.get((groupe, semaine_int), []):
+        st.warning(f"⚠️ Clé '{cle}' introuvable dans la légende.")
 
-    if donnees:
-        df = pd.DataFrame(donnees, columns=["Professeur", "Jour", "Heure", "Salle", "Matière"])
-        df.index = ['' for _ in range(len(df))]
-        st.dataframe(df, use_container_width=True, hide_index=True)
+    df = index.tableau(groupe, semaine_int)
+
+    if df is not None:
+        with mesurer("rendu_dataframe"):
+            st.dataframe(df, use_container_width=True, hide_index=True)
     else:
         st.info("ℹ️ Aucune donnée disponible pour cette semaine et ce groupe.")
 
+    # Semaines voisines construites d'avance : « Préc. » / « Suiv. » servent un tableau prêt
+    for voisine in (semaine_int - 1, semaine_int + 1):
+        if 1 <= voisine <= index.nb_semaines[groupe]:
+            index.preparer_tableau(groupe, voisine)
+
+# Navigation entre semaines réexécutée seule : un clic ne renvoie que cette section
+# (st.sidebar est interdit dans un fragment, d'où le sélecteur dans l'onglet).
+@st.fragment
+def afficher_semaine_colloscope(annee_scolaire_actuelle: str, semaine_defaut: int) -> None:
+    classe = st.session_state.classe
+    semaine_max = obtenir_index(classe, annee_scolaire_actuelle).semaine_max or 1
+    index_semaines = obtenir_index_semaines(classe, annee_scolaire_actuelle)
+
+    semaines_options = [str(i) for i in range(1, semaine_max + 1)]
+    if st.session_state.get("semaine_select") not in semaines_options:
+        semaine = str(st.session_state.semaine)
+        st.session_state.semaine_select = semaine if semaine in semaines_options else str(min(semaine_defaut, semaine_max))
+
+    cols = st.columns([3, 1, 1, 1], vertical_alignment="bottom")
+    st.session_state.semaine = cols[0].selectbox(
+        "Semaine",
+        options=semaines_options,
+        format_func=index_semaines.libelle,
+        key="semaine_select"
+    )
+    if cols[1].button("📋 Afficher", use_container_width=True, key="afficher_btn"):
+        st.session_state.afficher_colloscope = True
+    cols[2].button("◀ Préc.", use_container_width=True, key="prev_semaine_btn",
+                   on_click=changer_semaine, args=(-1, semaine_max))
+    cols[3].button("Suiv. ▶", use_container_width=True, key="next_semaine_btn",
+                   on_click=changer_semaine, args=(1, semaine_max))
+
+    if st.session_state.afficher_colloscope:
+        st.info("⚠️ Vérifiez votre colloscope papier pour éviter les erreurs.", icon="⚠️")
+        afficher_donnees_colloscope(annee_scolaire_actuelle)
+
+def afficher_vue_ensemble(classe: str, annee_scolaire: str) -> None:
+    st.header(f"🗓️ Vue d'ensemble — {libelle_classe(classe)}")
+    grille = obtenir_grille(classe, annee_scolaire)
+    if grille.empty:
+        st.info("ℹ️ Aucune donnée disponible pour cette classe.")
+        return
+
+    mode = st.radio("Afficher", ["Tous les groupes d'une semaine", "Toutes les semaines d'un groupe"],
+                    horizontal=True, key="vue_mode")
+    if mode == "Tous les groupes d'une semaine":
+        semaines = sorted(grille["Semaine"].unique())
+        semaine = st.selectbox("Semaine", semaines, key="vue_semaine")
+        selection = grille[grille["Semaine"] == semaine].drop(columns="Semaine")
+    else:
+        groupes = list(dict.fromkeys(grille["Groupe"]))
+        groupe = st.selectbox("Groupe", groupes, key="vue_groupe")
+        selection = grille[grille["Groupe"] == groupe].drop(columns="Groupe")
+
+    st.dataframe(selection, use_container_width=True, hide_index=True)
+
+def afficher_professeurs_salles(classe: str, annee_scolaire: str) -> None:
+    st.header(f"🔎 Professeurs et salles — {libelle_classe(classe)}")
+    index = obtenir_index(classe, annee_scolaire)
+    if not index.professeurs:
+        st.info("ℹ️ Aucune donnée disponible pour cette classe.")
+        return
+    index_semaines = obtenir_index_semaines(classe, annee_scolaire)
+    semaines = list(range(1, index.semaine_max + 1))
+    semaine_courante = min(index_semaines.semaine_pour(date.today())[0], index.semaine_max) - 1
+
+    col_professeurs, col_salles = st.columns(2)
+
+    with col_professeurs:
+        st.subheader("👩‍🏫 Colles d'un professeur")
+        professeur = st.selectbox("Professeur", index.professeurs, key="prof_professeur")
+        semaine = st.selectbox("Semaine", semaines, index=semaine_courante,
+                               format_func=lambda s: index_semaines.libelle(str(s)), key="prof_semaine")
+        colles = index.colles_professeur(professeur, semaine)
+        if colles:
+            st.dataframe(pd.DataFrame(
+                [[groupe, cle] + index.details[cle][1:] for groupe, cle in colles],
+                columns=["Groupe", "Clé", "Jour", "Heure", "Salle"],
+            ), use_container_width=True, hide_index=True)
+        else:
+            st.info(f"ℹ️ Aucune colle pour {professeur} en semaine {semaine}.")
+
+    with col_salles:
+        st.subheader("🚪 Salles libres")
+        if not index.creneaux:
+            st.info("ℹ️ Aucun créneau renseigné dans la légende.")
+            return
+        semaine = st.selectbox("Semaine", semaines, index=semaine_courante,
+                               format_func=lambda s: index_semaines.libelle(str(s)), key="salle_semaine")
+        jour, heure = st.selectbox("Créneau", index.creneaux,
+                                   format_func=lambda c: f"{c[0].capitalize()} {c[1]}", key="salle_creneau")
+        libres = index.salles_libres(semaine, jour, heure)
+        st.write(f"**Libres :** {', '.join(libres) if libres else 'aucune'}")
+        occupants = index.occupants(semaine, jour, heure)
+        if occupants:
+            st.dataframe(pd.DataFrame(
+                [[salle, index.details[cle][0], groupe, cle]
+                 for salle, colles in sorted(occupants.items()) for groupe, cle in colles],
+                columns=["Salle", "Professeur", "Groupe", "Clé"],
+            ), use_container_width=True, hide_index=True)
+        st.caption("Seules les salles qui apparaissent dans la légende du colloscope sont connues.")
+
+def afficher_export_ics(classe: str, annee_scolaire: str, groupe: str) -> None:
+    with st.sidebar.expander("📆 Exporter le calendrier"):
+        if not calendrier_disponible(classe, annee_scolaire):
+            st.info(f"ℹ️ Le colloscope de la classe {libelle_classe(classe)} n'est pas daté : export indisponible.")
+            return
+        index = obtenir_index(classe, annee_scolaire)
+        if groupe in index.nb_semaines:
+            st.download_button(
+                f"Groupe {groupe} (.ics)",
+                data=generer_ics(classe, annee_scolaire, groupe),
+                file_name=f"colloscope_{libelle_classe(classe).lower()}_{groupe}.ics",
+                mime="text/calendar",
+                use_container_width=True,
+                key="export_ics_groupe",
+            )
+        st.download_button(
+            f"Toute la classe {libelle_classe(classe)} (.ics)",
+            data=generer_ics(classe, annee_scolaire),
+            file_name=f"colloscope_{libelle_classe(classe).lower()}.ics",
+            mime="text/calendar",
+            use_container_width=True,
+            key="export_ics_classe",
+        )
+        st.caption("Pour un abonnement qui se met à jour seul : `/classes/<classe>/groups/<groupe>/calendar.ics` sur l'API.")
+
 def afficher_edt_eps() -> None:
     eps_files = ["EPS_page-0001.jpg", "EPS_page-0002.jpg"]
     col1, col2 = st.columns(2)
@@ -351,7 +1851,11 @@ def afficher_edt_eps() -> None:
         col = col1 if idx == 0 else col2
         if os.path.exists(file):
             try:
-                col.image(file, caption=f"EDT EPS TSI{idx + 1}", use_container_width=True)
+                col.image(
+                    image_reduite(chemin_ressource(file), CONFIG["eps_largeur_px"]),
+                    caption=f"EDT EPS TSI{idx + 1}",
+                    use_container_width=True,
+                )
             except Exception as e:
                 col.warning(f"Impossible de charger {file}: {e}")
         else:
@@ -363,18 +1867,101 @@ def afficher_dictionnaires_secrets(classe: str, annee_scolaire: str) -> None:
         dictionnaire_donnees, dictionnaire_legende, dates_semaines = charger_donnees(classe, annee_scolaire)
 
         with st.expander("📊 Dictionnaire de Données"):
-            st.json(dictionnaire_donnees)
+            st.json(dict(dictionnaire_donnees))
 
         with st.expander("📖 Dictionnaire de Légende"):
-            st.json(dictionnaire_legende)
+            st.json(dict(dictionnaire_legende))
 
         with st.expander("📅 Dates des Semaines"):
             dates_str = [d.strftime("%d/%m/%Y") if d else "None" for d in dates_semaines]
             st.write(dates_str)
 
+        avertissements = obtenir_index(classe, annee_scolaire).avertissements()
+        with st.expander(f"⚠️ Clés inconnues ({len(avertissements)})"):
+            for avertissement in avertissements:
+                st.write(f"- {avertissement}")
+
     except Exception as e:
         st.error(f"❌ Erreur lors de l'affichage des dictionnaires : {e}")
 
+def afficher_analyse(classe: str, annee_scolaire: str) -> None:
+    st.subheader("🚨 Analyse du colloscope")
+    rapport = obtenir_analyse(classe, annee_scolaire)
+    alertes = rapport.alertes_rotation()
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Collisions", len(rapport.collisions))
+    col2.metric("Professeurs", len(rapport.charge))
+    col3.metric("Rotations irrégulières", len(alertes))
+
+    if rapport.collisions:
+        st.dataframe(pd.DataFrame(rapport.collisions), use_container_width=True, hide_index=True)
+    else:
+        st.success("✅ Aucune collision détectée.")
+
+    with st.expander("👩‍🏫 Charge hebdomadaire par professeur"):
+        charge = pd.DataFrame(rapport.charge).T.sort_index().fillna(0).astype(int)
+        st.dataframe(charge.reindex(sorted(charge.columns), axis=1), use_container_width=True)
+
+    with st.expander(f"🔁 Rotations irrégulières ({len(alertes)})"):
+        if alertes:
+            st.dataframe(pd.DataFrame(alertes).drop(columns="alerte"), use_container_width=True, hide_index=True)
+        else:
+            st.write("Aucune.")
+
+def afficher_profilage() -> None:
+    st.write("**⏱️ Profilage du rendu** (toutes sessions confondues)")
+    registre = metriques()
+    resume = registre.resume()
+    if resume:
+        st.dataframe(pd.DataFrame(resume), use_container_width=True, hide_index=True)
+    else:
+        st.info("ℹ️ Aucune mesure pour l'instant.")
+
+    col1, col2, col3 = st.columns(3)
+    col1.download_button(
+        "📥 JSON", data=registre.exporter_json(), file_name="metriques_colloscope.json",
+        mime="application/json", use_container_width=True, key="btn_metriques_json",
+    )
+    col2.download_button(
+        "📥 Prometheus", data=registre.exporter_prometheus(), file_name="metriques_colloscope.prom",
+        mime="text/plain", use_container_width=True, key="btn_metriques_prom",
+    )
+    if col3.button("♻️ Réinitialiser", use_container_width=True, key="btn_metriques_reset"):
+        registre.reinitialiser()
+        st.rerun()
+
+def afficher_rechargements() -> None:
+    st.write("**Rechargements à chaud**")
+    gestionnaire = versions()
+    if gestionnaire.en_preparation:
+        st.caption("⏳ En préparation : " + ", ".join(libelle_classe(classe) for classe, _ in gestionnaire.en_preparation))
+    if not gestionnaire.journal:
+        st.caption("Aucun rechargement depuis le démarrage du processus.")
+        return
+
+    for entree in list(gestionnaire.journal):
+        titre = f"{entree['date'].strftime('%d/%m %H:%M:%S')} — {libelle_classe(entree['classe'])} ({entree['duree_ms']:.0f} ms)"
+        if "erreur" in entree:
+            st.error(f"❌ {titre} : {entree['erreur']}")
+            continue
+        diff = entree["diff"]
+        if not entree["bascule"]:
+            st.caption(f"{titre} : contenu identique, rien à basculer.")
+            continue
+        with st.expander(f"✅ {titre} : {len(diff['cellules'])} case(s), "
+                         f"{len(diff['cles_ajoutees']) + len(diff['cles_supprimees']) + len(diff['cles_modifiees'])} clé(s) modifiées"):
+            for libelle, nom in (("Groupes ajoutés", "groupes_ajoutes"), ("Groupes supprimés", "groupes_supprimes"),
+                                 ("Clés ajoutées", "cles_ajoutees"), ("Clés supprimées", "cles_supprimees"),
+                                 ("Clés modifiées", "cles_modifiees"), ("Semaines redatées", "semaines_redatees"),
+                                 ("Groupes reconstruits", "groupes_affectes")):
+                if diff[nom]:
+                    st.write(f"**{libelle} :** {', '.join(map(str, diff[nom]))}")
+            if diff["cellules"]:
+                st.dataframe(pd.DataFrame(diff["cellules"]).rename(columns={
+                    "groupe": "Groupe", "semaine": "Semaine", "avant": "Avant", "apres": "Après",
+                }), use_container_width=True, hide_index=True)
+
 def afficher_outils_debug(classe: str, annee_scolaire: str) -> None:
     st.subheader("🔧 Outils de Débogage")
 
@@ -382,9 +1969,8 @@ def afficher_outils_debug(classe: str, annee_scolaire: str) -> None:
 
     with col1:
         if st.button("🔄 Recharger données", use_container_width=True, key="btn_reload"):
-            st.cache_data.clear()
-            st.success("✅ Cache vidé !")
-            st.rerun()
+            versions().recharger(classe, annee_scolaire)
+            st.success(f"✅ Relecture de la classe {classe} lancée : la version actuelle reste servie jusqu'à la bascule.")
 
     with col2:
         if st.button("🧹 Vider tout le cache", use_container_width=True, key="btn_clear_cache"):
@@ -405,13 +1991,37 @@ def afficher_outils_debug(classe: str, annee_scolaire: str) -> None:
     col_i2.metric("Année Scolaire", annee_scolaire)
     col_i3.metric("Classe Actuelle", classe)
 
+    st.markdown("---")
+    afficher_rechargements()
+
+    st.markdown("---")
+    afficher_profilage()
+
     st.markdown("---")
     st.write("**Test API Vacances**")
+    magasin = magasin_vacances()
+    etat = []
+    for zone, annee in cles_vacances(annee_scolaire):
+        entree = magasin.lire(zone, annee)
+        etat.append({
+            "Zone": zone,
+            "Année": annee,
+            "Périodes": len(entree["vacances"]) if entree else None,
+            "Mise à jour": datetime.fromtimestamp(entree["maj"]).strftime('%d/%m/%Y %H:%M') if entree else "—",
+            "Dernier échec": magasin.erreurs.get((zone, annee), ""),
+        })
+    st.dataframe(pd.DataFrame(etat), use_container_width=True, hide_index=True)
+
     if st.button("📡 Tester récupération vacances", key="btn_vacances"):
-        with st.spinner("Récupération en cours..."):
-            vacances = obtenir_vacances("C", annee_scolaire)
-        if vacances:
-            st.success(f"✅ {len(vacances)} période(s) de vacances récupérées.")
+        with st.spinner("Récupération de toutes les zones en cours..."):
+            resultats = rafraichir_toutes_vacances(annee_scolaire)
+        echecs = {cle: e for cle, e in resultats.items() if isinstance(e, Exception)}
+        for (zone, annee), e in echecs.items():
+            st.warning(f"⚠️ Zone {zone}, {annee} : impossible de récupérer les vacances : {e}")
+        vacances = resultats.get((CONFIG["zone_vacances"], annee_scolaire))
+        if isinstance(vacances, list) and vacances:
+            st.success(f"✅ {len(resultats) - len(echecs)}/{len(resultats)} calendrier(s) récupérés. "
+                       f"Zone {CONFIG['zone_vacances']}, {annee_scolaire} :")
             for debut, fin in vacances:
                 st.write(f"- {to_naive(debut).strftime('%d/%m/%Y')} → {to_naive(fin).strftime('%d/%m/%Y')}")
         else:
@@ -444,10 +2054,39 @@ def dialog_authentification():
         if st.button("❌ Fermer", use_container_width=True, key="btn_fermer_dialog"):
             st.rerun()
 
+# ============================================================================
+# PRÉCHAUFFAGE
+# ============================================================================
+
+def prechauffer_classes(annee_scolaire_str: str) -> None:
+    prechauffer_vacances(annee_scolaire_str)
+    # Pas plus de classes que les caches n'en gardent : au-delà, le préchauffage
+    # évincerait celles que les premiers visiteurs viennent d'ouvrir
+    servies = set(versions().servies)
+    places = max(0, CONFIG["classes_en_memoire"] - len(servies))
+    for classe in [classe for classe in decouvrir_classes() if (classe, annee_scolaire_str) not in servies][:places]:
+        try:
+            obtenir_index(classe, annee_scolaire_str)
+            obtenir_grille(classe, annee_scolaire_str)
+        except Exception:
+            # La page signalera elle-même l'erreur au moment d'afficher la classe
+            pass
+
+@st.cache_resource
+def prechauffage(annee_scolaire_str: str) -> threading.Thread:
+    # Une fois par processus : les classes que personne n'a encore ouvertes sont
+    # chargées hors du chemin de la requête, les caches partagés font le reste.
+    fil = threading.Thread(
+        target=prechauffer_classes, args=(annee_scolaire_str,), daemon=True, name="prechauffage"
+    )
+    fil.start()
+    return fil
+
 # ============================================================================
 # APPLICATION PRINCIPALE
 # ============================================================================
 
+@instrumenter("reexecution_complete")
 def main():
     annee_scolaire_actuelle = detecter_annee_scolaire_actuelle()
 
@@ -470,7 +2109,7 @@ def main():
     st.sidebar.markdown("---")
 
     # Onglets dynamiques
-    tab_names = ["📅 Colloscope"]
+    tab_names = ["📅 Colloscope", "🗓️ Vue d'ensemble", "🔎 Professeurs et salles"]
     if st.session_state.get("authenticated_owner", False):
         tab_names.append("🛠️ Outils Propriétaire")
 
@@ -480,30 +2119,45 @@ def main():
     with tabs[0]:
         st.header("📅 Colloscope TSI")
 
-        with st.expander("🏀 Afficher EDT EPS"):
-            afficher_edt_eps()
+        # Images envoyées seulement une fois l'expander ouvert
+        expander_eps = st.expander("🏀 Afficher EDT EPS", key="expander_eps", on_change="rerun")
+        with expander_eps:
+            if expander_eps.open:
+                afficher_edt_eps()
 
         st.sidebar.subheader("⚙️ Sélection")
 
-        # Chargement des données pour calculer la semaine actuelle
+        # Semaine actuelle : recherche dichotomique mémorisée par jour
+        en_vacances = False
+        non_date = False
         try:
-            _, _, dates_semaines = charger_donnees(st.session_state.classe, annee_scolaire_actuelle)
-            semaines_ecoulees = semaine_actuelle(dates_semaines)
+            index_semaines = obtenir_index_semaines(st.session_state.classe, annee_scolaire_actuelle)
+            semaines_ecoulees, en_vacances = index_semaines.semaine_pour(date.today())
+            non_date = not index_semaines.lundis
         except Exception:
             semaines_ecoulees = 1
 
         date_actuelle_str = datetime.now().strftime("%d/%m/%Y")
         st.sidebar.write(f"**Date :** {date_actuelle_str}")
-        st.sidebar.write(f"**Semaine actuelle :** {semaines_ecoulees}")
+        st.sidebar.write(
+            f"**Semaine actuelle :** {semaines_ecoulees}"
+            + (" (vacances 🏖️)" if en_vacances else "")
+            + (" (colloscope non daté)" if non_date else "")
+        )
         st.sidebar.write(f"**Année scolaire :** {annee_scolaire_actuelle}")
 
         # Widgets de sélection
+        classes = decouvrir_classes()
         st.session_state.classe = st.sidebar.selectbox(
-            "Classe TSI",
-            options=["1", "2"],
-            index=["1", "2"].index(st.session_state.classe) if st.session_state.classe in ["1", "2"] else 0,
+            "Classe",
+            options=classes,
+            index=classes.index(st.session_state.classe) if st.session_state.classe in classes else 0,
+            format_func=libelle_classe,
             key="classe_select"
         )
+        if st.session_state.classe is None:
+            st.error("❌ Aucun couple Colloscope<classe>.xlsx / Legende<classe>.xlsx trouvé.")
+            return
 
         st.session_state.groupe = st.sidebar.text_input(
             "Groupe (ex: G1)",
@@ -511,43 +2165,23 @@ def main():
             key="groupe_input"
         )
 
-        # Index semaine basé sur session_state
-        semaines_options = [str(i) for i in range(1, CONFIG["max_weeks"] + 1)]
-        try:
-            semaine_index = semaines_options.index(str(st.session_state.semaine))
-        except ValueError:
-            semaine_index = semaines_ecoulees - 1
-
-        st.session_state.semaine = st.sidebar.selectbox(
-            "Semaine",
-            options=semaines_options,
-            index=semaine_index,
-            key="semaine_select"
-        )
-
         st.sidebar.markdown("---")
 
-        cols = st.sidebar.columns(3)
+        afficher_export_ics(st.session_state.classe, annee_scolaire_actuelle, st.session_state.groupe)
 
-        if cols[0].button("📋 Afficher", use_container_width=True, key="afficher_btn"):
-            st.session_state.afficher_colloscope = True
+        afficher_semaine_colloscope(annee_scolaire_actuelle, semaines_ecoulees)
 
-        if cols[1].button("◀ Préc.", use_container_width=True, key="prev_semaine_btn"):
-            changer_semaine(-1)
-            st.session_state.afficher_colloscope = True
+    # ===== ONGLET VUE D'ENSEMBLE =====
+    with tabs[1]:
+        afficher_vue_ensemble(st.session_state.classe, annee_scolaire_actuelle)
 
-        if cols[2].button("Suiv. ▶", use_container_width=True, key="next_semaine_btn"):
-            changer_semaine(1)
-            st.session_state.afficher_colloscope = True
-
-        # ✅ Affichage déclenché après rerun, semaine déjà mise à jour
-        if st.session_state.afficher_colloscope:
-            st.sidebar.info("⚠️ Vérifiez votre colloscope papier pour éviter les erreurs.", icon="⚠️")
-            afficher_donnees_colloscope(annee_scolaire_actuelle)
+    # ===== ONGLET PROFESSEURS ET SALLES =====
+    with tabs[2]:
+        afficher_professeurs_salles(st.session_state.classe, annee_scolaire_actuelle)
 
     # ===== ONGLET OUTILS PROPRIÉTAIRE =====
-    if st.session_state.get("authenticated_owner", False) and len(tabs) > 1:
-        with tabs[1]:
+    if st.session_state.get("authenticated_owner", False) and len(tabs) > 3:
+        with tabs[3]:
             st.subheader("🛠️ Outils Propriétaire")
 
             if st.button("🚪 Déconnexion", key="owner_logout_btn"):
@@ -556,13 +2190,16 @@ def main():
 
             st.markdown("---")
 
-            debug_tabs = st.tabs(["📚 Dictionnaires", "🔧 Outils de Debug"])
+            debug_tabs = st.tabs(["📚 Dictionnaires", "🚨 Analyse", "🔧 Outils de Debug"])
 
             with debug_tabs[0]:
                 if st.button("🔍 Afficher les dictionnaires", key="show_dicts_btn"):
                     afficher_dictionnaires_secrets(st.session_state.classe, annee_scolaire_actuelle)
 
             with debug_tabs[1]:
+                afficher_analyse(st.session_state.classe, annee_scolaire_actuelle)
+
+            with debug_tabs[2]:
                 afficher_outils_debug(st.session_state.classe, annee_scolaire_actuelle)
 
     # Bouton accès propriétaire
@@ -584,5 +2221,9 @@ def main():
         unsafe_allow_html=True
     )
 
+    # Lancé une fois la page construite, pour ne pas disputer le premier rendu
+    if CONFIG["prechauffage"]:
+        prechauffage(annee_scolaire_actuelle)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,55 @@
+"""Vérifie les colloscopes : collisions, charge des professeurs, rotations.
+
+Usage : python verifier_colloscope.py [classe ...] [--annee 2024-2025]
+
+Code de sortie 1 si au moins une collision est détectée (utilisable en CI
+ou avant de déposer de nouveaux classeurs). Une clé partagée par plusieurs
+groupes la même semaine n'est tolérée que pour les matières déclarées
+collectives (COLLOSCOPE_PREFIXES_COLLECTIFS, "I" par défaut).
+"""
+import argparse
+import sys
+
+import streamlit_app as app
+
+
+def verifier(classe, annee):
+    dictionnaire_donnees, dictionnaire_legende, _ = app.charger_donnees(classe, annee)
+    if not dictionnaire_donnees:
+        print(f"Classe {app.libelle_classe(classe)} : données illisibles.")
+        return 1
+
+    rapport = app.analyser_colloscope(dictionnaire_donnees, dictionnaire_legende)
+    print(f"== Classe {app.libelle_classe(classe)} : {len(dictionnaire_donnees)} groupes, "
+          f"{len(rapport.charge)} professeurs")
+
+    for collision in rapport.collisions:
+        print(f"  [S{collision['semaine']}] {collision['type']} : {collision['detail']} -> {collision['groupes']}")
+    if not rapport.collisions:
+        print("  Aucune collision.")
+
+    for rotation in rapport.alertes_rotation():
+        print(f"  Rotation : {rotation['groupe']} en {rotation['matiere']}, {rotation['ecart_max']} semaines "
+              f"sans colle (médiane {rotation['ecart_median_matiere']})")
+
+    charges = {prof: max(semaines.values()) for prof, semaines in rapport.charge.items()}
+    for professeur, maximum in sorted(charges.items(), key=lambda item: -item[1])[:5]:
+        print(f"  Charge max : {professeur} {maximum} colle(s)/semaine")
+
+    return 1 if rapport.collisions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("classes", nargs="*", help="classes à vérifier (défaut : toutes)")
+    parser.add_argument("--annee", default=app.detecter_annee_scolaire_actuelle())
+    args = parser.parse_args()
+
+    statut = 0
+    for classe in args.classes or app.decouvrir_classes():
+        statut |= verifier(classe, args.annee)
+    sys.exit(statut)
+
+
+if __name__ == "__main__":
+    main()